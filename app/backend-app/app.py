@@ -1,32 +1,48 @@
 # app/backend-app/app.py
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 import os
-import psycopg2 # PostgresSQL adapter
-from psycopg2 import OperationalError
+from psycopg2 import DatabaseError, InterfaceError, OperationalError
+
+from db_pool import connect_dedicated, get_pool, PoolExhausted
+from health import get_prober, HEALTH_PROBE_TIMEOUT, STATUS_CODES
+from cache import cache, cached
+from listing import BadRequest, open_stream, parse_page_args
+import metrics
 
 app = Flask(__name__)
+metrics.init_app(app) # Request metrics and the /metrics endpoint
 
 # Environment variables will be populated by ECS Task Definition
-DB_HOST = os.environ.get("DB_HOST")
-DB_NAME = os.environ.get("DB_NAME")
-DB_USER = os.environ.get("DB_USER")
-DB_PASSWORD = os.environ.get("DB_PASSWORD") # From Secrets Manager
+# DB_HOST, DB_NAME, DB_USER and DB_PASSWORD (from Secrets Manager) are read by db_pool,
+# which keeps a per-worker pool of connections instead of connecting on every request.
+
+def ping_db(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+
+# The health prober uses its own connection rather than the request pool: a busy pool must not fail the
+# probe, and the connection's statement timeout bounds how long one probe can take
+_probe_conn = None
 
-def get_db_connection():
-    conn = None
+def probe_db():
+    global _probe_conn
+    if _probe_conn is None or _probe_conn.closed:
+        _probe_conn = connect_dedicated(HEALTH_PROBE_TIMEOUT * 1000)
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        return conn
-    except OperationalError as e:
-        print(f"Database connection failed: {e}")
-        return None
-    
+        ping_db(_probe_conn)
+        _probe_conn.rollback()
+    except (OperationalError, InterfaceError):
+        # Reconnect on the next probe
+        _probe_conn.close()
+        _probe_conn = None
+        raise
+
+@app.errorhandler(500)
+def internal_server_error(e):
+    # Same body as asgi.py returns for an unhandled error; Flask has already logged the exception
+    return jsonify({"error": "Internal server error."}), 500
+
 @app.route('/')
 def hello_backend():
     hostname = os.uname().nodename
@@ -37,14 +53,58 @@ def health_check():
     # Simple health check endpoint for the internal load balancer
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/health/deep')
+def deep_health_check():
+    # Returns the cached result of the background DB prober; never touches the network itself
+    health = get_prober(probe_db).cache.snapshot()
+    return jsonify(health), STATUS_CODES[health["status"]]
+
 @app.route('/db-test')
 def db_test():
-    conn = get_db_connection()
-    if conn:
-        conn.close()
+    try:
+        get_pool().run(ping_db)
         return jsonify({"db_status": "Database connection successful!"}), 200
-    else:
+    except (OperationalError, PoolExhausted) as e:
+        print(f"Database connection failed: {e}")
         return jsonify({"db_status": "Database connection failed."}), 500
+
+def fetch_db_info(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT version(), current_database(), pg_database_size(current_database())")
+        version, database, size_bytes = cur.fetchone()
+    return {"version": version, "database": database, "size_bytes": size_bytes}
+
+@app.route('/db-info')
+@cached(ttl=int(os.environ.get("DB_INFO_CACHE_TTL", 60)))
+def db_info():
+    # Read-only and rarely changing, so served from the response cache
+    try:
+        return jsonify(get_pool().run(fetch_db_info)), 200
+    except (OperationalError, PoolExhausted) as e:
+        print(f"Database query failed: {e}")
+        return jsonify({"db_status": "Database query failed."}), 500
+
+@app.route('/items')
+def list_items():
+    # Streamed page of items: ?after=<last id of the previous page>&limit=<rows> (see listing.py)
+    try:
+        after, limit = parse_page_args(request.args)
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return Response(open_stream("items", after, limit), mimetype="application/json")
+    except (DatabaseError, PoolExhausted) as e:
+        print(f"Database query failed: {e}")
+        return jsonify({"db_status": "Database query failed."}), 500
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(cache.stats()), 200
+
+@app.route('/db-pool-stats')
+def db_pool_stats():
+    # Per-worker pool statistics (each gunicorn worker owns its own pool)
+    return jsonify(get_pool().stats()), 200
     
 if __name__=='__main__':
     # Flask app listens on all available interfaces (0.0.0.0) on the specified port
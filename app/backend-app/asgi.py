@@ -0,0 +1,325 @@
+# app/backend-app/asgi.py
+
+# Async serving mode for the backend (BACKEND_MODE=async).
+# Serves the same routes, bodies and status codes as app.py, but runs on an asyncio event loop
+# with a non-blocking Postgres driver, so one worker can hold many concurrent slow queries.
+# Run with: gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qsl
+
+import asyncpg # Async PostgreSQL driver
+
+from cache import cache
+from health import HealthCache, HEALTH_PROBE_INTERVAL, HEALTH_PROBE_TIMEOUT, STATUS_CODES
+from listing import LIST_FETCH_SIZE, RESOURCES, BadRequest, build_query, encode_rows, page_end, parse_page_args
+from metrics import DB_QUERY_LATENCY, IN_FLIGHT, observe_request, render_metrics
+
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 20)) # Connections are cheap to wait on here, but still count against RDS max_connections
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5)) # Seconds to wait for a free connection
+DB_CONNECT_TIMEOUT = float(os.environ.get("DB_CONNECT_TIMEOUT", 5))
+DB_INFO_CACHE_TTL = int(os.environ.get("DB_INFO_CACHE_TTL", 60)) # As for /db-info in app.py
+
+_pool = None
+_pool_lock = None
+_health = HealthCache()
+_prober_task = None
+_probe_conn = None # The prober's own connection, outside the request pool (see probe_db)
+_cache_locks = {} # key -> asyncio.Lock, so concurrent misses in this worker run the query once
+
+async def get_pool():
+    """Create the asyncpg pool on first use inside the worker's event loop."""
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                min_size=DB_POOL_MIN,
+                max_size=DB_POOL_MAX,
+                timeout=DB_CONNECT_TIMEOUT,
+                **connect_kwargs(),
+            )
+    return _pool
+
+def connect_kwargs():
+    return {
+        "host": os.environ.get("DB_HOST"),
+        "port": int(os.environ.get("DB_PORT", 5432)),
+        "database": os.environ.get("DB_NAME"),
+        "user": os.environ.get("DB_USER"),
+        "password": os.environ.get("DB_PASSWORD"), # From Secrets Manager
+    }
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+def json_response(data, status=200):
+    # Same output as Flask's jsonify: compact, keys sorted
+    body = (json.dumps(data, separators=(",", ":"), sort_keys=True) + "\n").encode()
+    return status, "application/json", body
+
+def text_response(text, status=200):
+    return status, "text/html; charset=utf-8", text.encode()
+
+async def hello_backend():
+    hostname = os.uname().nodename
+    return text_response(f"Hello from the Backend! This is instance: {hostname}\n")
+
+async def health_check():
+    # Simple health check endpoint for the internal load balancer
+    return json_response({"status": "healthy"}, 200)
+
+async def ping_db(conn):
+    start = time.perf_counter()
+    try:
+        await conn.fetchval("SELECT 1")
+    finally:
+        DB_QUERY_LATENCY.labels("ping_db").observe(time.perf_counter() - start)
+
+async def probe_db():
+    """
+    Background task that keeps the cached deep health result fresh.
+    It uses its own connection rather than the request pool, so a busy pool doesn't fail the probe,
+    and every probe is bounded by HEALTH_PROBE_TIMEOUT (client-side and as the statement timeout).
+    """
+    global _probe_conn
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        try:
+            if _probe_conn is None or _probe_conn.is_closed():
+                _probe_conn = await asyncpg.connect(
+                    timeout=DB_CONNECT_TIMEOUT,
+                    command_timeout=HEALTH_PROBE_TIMEOUT,
+                    server_settings={"statement_timeout": str(int(HEALTH_PROBE_TIMEOUT * 1000))},
+                    **connect_kwargs(),
+                )
+            await ping_db(_probe_conn)
+        except Exception as e:
+            print(f"Health probe failed: {e}")
+            _health.record(error=e)
+            if _probe_conn is not None:
+                # Reconnect on the next probe
+                _probe_conn.terminate()
+                _probe_conn = None
+        else:
+            _health.record(latency_ms=(loop.time() - start) * 1000)
+        await asyncio.sleep(HEALTH_PROBE_INTERVAL)
+
+async def deep_health_check():
+    global _prober_task
+    if _prober_task is None:
+        _prober_task = asyncio.get_running_loop().create_task(probe_db())
+    health = _health.snapshot()
+    return json_response(health, STATUS_CODES[health["status"]])
+
+async def db_test():
+    try:
+        pool = await get_pool()
+        async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            await ping_db(conn)
+        return json_response({"db_status": "Database connection successful!"}, 200)
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        print(f"Database connection failed: {e}")
+        return json_response({"db_status": "Database connection failed."}, 500)
+
+async def cached_response(key, ttl, compute):
+    """
+    Async counterpart of cache.cached: serves a successful response from the shared response cache,
+    or awaits compute() once per key and caches it for ttl seconds. Entries use the same
+    "<status>\n<content type>\n<body>" encoding as the sync routes.
+    """
+    value = cache.lookup(key)
+    if value is None:
+        lock = _cache_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another request may have filled the entry while we waited
+            value = cache.lookup(key)
+            if value is None:
+                status, content_type, body = await compute()
+                cache.fill(key, f"{status}\n{content_type}\n".encode() + body, ttl, cacheable=status == 200)
+                return status, content_type, body
+    status, content_type, body = value.split(b"\n", 2)
+    return int(status), content_type.decode(), body
+
+async def fetch_db_info():
+    try:
+        pool = await get_pool()
+        async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            start = time.perf_counter()
+            try:
+                row = await conn.fetchrow("SELECT version(), current_database(), pg_database_size(current_database())")
+            finally:
+                DB_QUERY_LATENCY.labels("fetch_db_info").observe(time.perf_counter() - start)
+        return json_response({"version": row[0], "database": row[1], "size_bytes": row[2]}, 200)
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        print(f"Database query failed: {e}")
+        return json_response({"db_status": "Database query failed."}, 500)
+
+async def db_info():
+    # Read-only and rarely changing, so served from the response cache
+    return await cached_response("/db-info", DB_INFO_CACHE_TTL, fetch_db_info)
+
+async def cache_stats():
+    return json_response(cache.stats(), 200)
+
+async def db_pool_stats():
+    stats = {"pid": os.getpid(), "min_size": DB_POOL_MIN, "max_size": DB_POOL_MAX, "size": 0, "idle": 0, "in_use": 0}
+    if _pool is not None:
+        stats["size"] = _pool.get_size()
+        stats["idle"] = _pool.get_idle_size()
+        stats["in_use"] = stats["size"] - stats["idle"]
+    return json_response(stats, 200)
+
+async def metrics_endpoint():
+    body, content_type = render_metrics()
+    return 200, content_type, body
+
+async def stream_list(resource, scope, send, head=False):
+    """
+    Streams one page of a list endpoint, like listing.open_stream in sync mode: an asyncpg cursor
+    fetches LIST_FETCH_SIZE rows at a time and each batch is sent as its own body chunk.
+    Sends the response itself and returns the status code.
+    """
+    try:
+        after, limit = parse_page_args(dict(parse_qsl(scope["query_string"].decode())))
+    except BadRequest as e:
+        await send_response(send, *json_response({"error": str(e)}, 400), head=head)
+        return 400
+
+    spec = RESOURCES[resource]
+    key_index = spec["columns"].index(spec["key"])
+    query, params = build_query(resource, after, ("$1", "$2"))
+    started = False
+    try:
+        pool = await get_pool()
+        async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            # asyncpg cursors only exist inside a transaction
+            async with conn.transaction(readonly=True):
+                start = time.perf_counter()
+                cursor = await conn.cursor(query, *params, limit)
+                batch = await cursor.fetch(LIST_FETCH_SIZE)
+                DB_QUERY_LATENCY.labels(f"list_{resource}").observe(time.perf_counter() - start)
+
+                # No content-length, so the server sends the body chunked as it is produced
+                await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+                started = True
+                if head:
+                    await send({"type": "http.response.body", "body": b""})
+                    return 200
+                await send({"type": "http.response.body", "body": b'{"items":[', "more_body": True})
+                count, last_key = 0, None
+                while batch:
+                    chunk = encode_rows(spec["columns"], batch, first=count == 0)
+                    await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+                    count += len(batch)
+                    last_key = batch[-1][key_index]
+                    if len(batch) < LIST_FETCH_SIZE:
+                        break # The cursor is exhausted; skip the empty fetch
+                    batch = await cursor.fetch(LIST_FETCH_SIZE)
+                await send({"type": "http.response.body", "body": page_end(count, limit, last_key).encode()})
+        return 200
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        if started:
+            # Headers are already sent, so the client sees a truncated body rather than an error status
+            print(f"Database error while streaming {resource}: {e}")
+            raise
+        print(f"Database query failed: {e}")
+        await send_response(send, *json_response({"db_status": "Database query failed."}, 500), head=head)
+        return 500
+
+# Streamed list endpoints: path -> resource in listing.RESOURCES
+STREAM_ROUTES = {
+    "/items": "items",
+}
+
+ROUTES = {
+    "/": hello_backend,
+    "/health": health_check,
+    "/health/deep": deep_health_check,
+    "/db-test": db_test,
+    "/db-info": db_info,
+    "/cache/stats": cache_stats,
+    "/db-pool-stats": db_pool_stats,
+    "/metrics": metrics_endpoint,
+}
+
+async def send_response(send, status, content_type, body, head=False):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": b"" if head else body})
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _prober_task is not None:
+                _prober_task.cancel()
+            if _probe_conn is not None:
+                _probe_conn.terminate()
+            await close_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    handler = ROUTES.get(scope["path"])
+    stream_resource = STREAM_ROUTES.get(scope["path"])
+    route = scope["path"] if handler is not None or stream_resource is not None else "unmatched"
+    start = time.perf_counter()
+    IN_FLIGHT.inc()
+    status, body = 500, None # Recorded as a 500 if the handler raises
+    started = False
+
+    async def tracked_send(message):
+        nonlocal started
+        started = started or message["type"] == "http.response.start"
+        await send(message)
+
+    try:
+        if scope["method"] in ("GET", "HEAD") and stream_resource is not None:
+            # Streamed routes send their own response
+            status = await stream_list(stream_resource, scope, tracked_send, head=scope["method"] == "HEAD")
+        else:
+            if handler is None and stream_resource is None:
+                response = text_response("Not Found\n", 404)
+            elif scope["method"] not in ("GET", "HEAD"):
+                response = text_response("Method Not Allowed\n", 405)
+            else:
+                response = await handler()
+            await send_response(tracked_send, *response, head=scope["method"] == "HEAD")
+            status, _, body = response
+    except Exception as e:
+        print(f"Unhandled error on {scope['method']} {scope['path']}: {e!r}")
+        if started:
+            raise # Too late for an error status; the server closes the connection
+        response = json_response({"error": "Internal server error."}, 500)
+        await send_response(send, *response, head=scope["method"] == "HEAD")
+        status, _, body = response
+    finally:
+        IN_FLIGHT.dec()
+        # Streamed responses have no length up front and are skipped, as in sync mode
+        observe_request(scope["method"], route, status, start, len(body) if body is not None else None)
@@ -0,0 +1,290 @@
+# app/backend-app/cache.py
+
+# Read-through response cache for DB-backed routes.
+# Enable it per route with @cached(ttl=...). Entries expire after their TTL, memory is bounded with
+# LRU eviction, and a miss is computed once even when many requests for the same key arrive together.
+#
+# CACHE_BACKEND=memory (default) keeps entries in each gunicorn worker.
+# CACHE_BACKEND=redis shares entries between all workers through a Redis-compatible server
+# (e.g. a Redis/Valkey sidecar on localhost, configured with maxmemory and an allkeys-lru policy).
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, make_response, request
+from prometheus_client import Counter
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 1024)) # Per worker, memory backend only
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 16 * 1024 * 1024)) # Per worker, memory backend only
+CACHE_LOCK_TIMEOUT = float(os.environ.get("CACHE_LOCK_TIMEOUT", 5)) # Max seconds a miss waits for another worker's query
+CACHE_KEY_PREFIX = "response-cache:"
+
+CACHE_EVENTS = Counter("response_cache_events_total", "Response cache hits, misses, evictions and invalidations", ["event"])
+
+class MemoryBackend:
+    """In-process LRU store bounded by entry count and total value size."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (expires_at, value), least recently used first
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+                CACHE_EVENTS.labels("eviction").inc()
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def acquire_lock(self, key, timeout):
+        # Misses inside one worker are already serialized by ResponseCache's per-key locks
+        return True
+
+    def release_lock(self, key):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), "bytes": self._bytes,
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+class RedisBackend:
+    """Shared store for all workers; TTLs and LRU eviction are enforced by the Redis server."""
+
+    def __init__(self, url=CACHE_REDIS_URL, client=None):
+        if client is None:
+            import redis # Only needed when CACHE_BACKEND=redis
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+
+    def get(self, key):
+        return self.client.get(CACHE_KEY_PREFIX + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(CACHE_KEY_PREFIX + key, value, px=int(ttl * 1000))
+
+    def delete(self, key):
+        self.client.delete(CACHE_KEY_PREFIX + key)
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=CACHE_KEY_PREFIX + prefix + "*", count=500))
+        if keys:
+            self.client.delete(*keys)
+
+    def acquire_lock(self, key, timeout):
+        # Only one worker across the task runs the query for a missing key
+        return bool(self.client.set(CACHE_KEY_PREFIX + "lock:" + key, b"1", nx=True, px=int(timeout * 1000)))
+
+    def release_lock(self, key):
+        self.client.delete(CACHE_KEY_PREFIX + "lock:" + key)
+
+    def stats(self):
+        info = self.client.info("stats")
+        return {"backend": "redis", "evictions": info.get("evicted_keys", 0)}
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._locks_guard = threading.Lock()
+        self._locks = {} # key -> [lock, waiters]
+        self._stats = {"hits": 0, "misses": 0, "stampede_waits": 0, "invalidations": 0, "errors": 0}
+
+    def _count(self, event):
+        with self._locks_guard:
+            self._stats[event] += 1
+        CACHE_EVENTS.labels(event).inc()
+
+    def _backend_get(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            # A cache outage must never fail the request, only make it slower
+            print(f"Cache get failed for {key}: {e}")
+            self._count("errors")
+            return None
+
+    def _backend_set(self, key, value, ttl):
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception as e:
+            print(f"Cache set failed for {key}: {e}")
+            self._count("errors")
+
+    def lookup(self, key):
+        """
+        Return the cached value for key, or None.
+        For callers that compute the value themselves and then call fill(), such as the async routes in asgi.py.
+        """
+        value = self._backend_get(key)
+        if value is not None:
+            self._count("hits")
+        return value
+
+    def fill(self, key, value, ttl, cacheable=True):
+        """Count a miss the caller has computed, and cache its value if cacheable."""
+        self._count("misses")
+        if cacheable:
+            self._backend_set(key, value, ttl)
+
+    def _key_lock(self, key):
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+            return entry
+
+    def _drop_key_lock(self, key, entry):
+        with self._locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    def get_or_compute(self, key, ttl, compute, cacheable=lambda value: True):
+        """
+        Return the cached value for key, or call compute() once to fill it.
+        Concurrent misses for the same key wait for that single computation instead of repeating it.
+        """
+        value = self._backend_get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        entry = self._key_lock(key)
+        try:
+            with entry[0]:
+                # Another thread may have filled the entry while we waited for the lock
+                value = self._backend_get(key)
+                if value is not None:
+                    self._count("hits")
+                    return value
+                value = self._compute_shared(key, ttl, compute, cacheable)
+                return value
+        finally:
+            self._drop_key_lock(key, entry)
+
+    def _compute_shared(self, key, ttl, compute, cacheable):
+        try:
+            locked = self.backend.acquire_lock(key, CACHE_LOCK_TIMEOUT)
+        except Exception as e:
+            print(f"Cache lock failed for {key}: {e}")
+            self._count("errors")
+            locked = True # Fall back to computing locally
+
+        if not locked:
+            # Another worker is running the query; wait briefly for its result
+            self._count("stampede_waits")
+            deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                value = self._backend_get(key)
+                if value is not None:
+                    self._count("hits")
+                    return value
+
+        self._count("misses")
+        try:
+            value = compute()
+            if cacheable(value):
+                self._backend_set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                try:
+                    self.backend.release_lock(key)
+                except Exception:
+                    pass
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+        self._count("invalidations")
+
+    def invalidate_prefix(self, prefix):
+        """Drop every entry whose key starts with prefix, e.g. a route path."""
+        self.backend.delete_prefix(prefix)
+        self._count("invalidations")
+
+    def stats(self):
+        with self._locks_guard:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["pid"] = os.getpid()
+        try:
+            stats.update(self.backend.stats())
+        except Exception as e:
+            stats["backend_error"] = str(e)
+        return stats
+
+def _make_backend():
+    if CACHE_BACKEND == "redis":
+        return RedisBackend()
+    return MemoryBackend()
+
+cache = ResponseCache(_make_backend())
+
+# Cached responses are stored as "<status>\n<content type>\n<body>" so any backend can hold them as bytes
+def _encode_response(response):
+    return f"{response.status_code}\n{response.mimetype}\n".encode() + response.get_data()
+
+def _decode_response(value):
+    status, content_type, body = value.split(b"\n", 2)
+    return Response(body, status=int(status), mimetype=content_type.decode())
+
+def cached(ttl):
+    """
+    Cache successful responses of a GET route for ttl seconds, keyed on path and query string.
+    Invalidate with cache.invalidate_prefix('/route').
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+
+            def compute():
+                return _encode_response(make_response(view(*args, **kwargs)))
+
+            value = cache.get_or_compute(request.full_path, ttl, compute, cacheable=lambda value: value.startswith(b"200\n"))
+            return _decode_response(value)
+        return wrapper
+    return decorator
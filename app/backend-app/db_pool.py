@@ -0,0 +1,260 @@
+# app/backend-app/db_pool.py
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2 # PostgresSQL adapter
+from psycopg2 import OperationalError, InterfaceError
+
+from metrics import DB_CONNECT_LATENCY, DB_QUERY_LATENCY
+
+# Pool sizing is per gunicorn worker, so the total number of RDS connections per task
+# is roughly workers * DB_POOL_MAX. Keep that below the RDS instance's max_connections.
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 5))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5)) # Seconds to wait for a free connection
+DB_POOL_VALIDATE_AFTER = float(os.environ.get("DB_POOL_VALIDATE_AFTER", 30)) # Idle seconds before a checkout runs 'SELECT 1'
+DB_CONNECT_TIMEOUT = int(os.environ.get("DB_CONNECT_TIMEOUT", 5))
+
+class PoolExhausted(Exception):
+    """Raised when no connection could be checked out within the pool timeout."""
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool.
+    Connections are validated on checkout and replaced when they turn out to be stale.
+    """
+
+    def __init__(self, connect_kwargs, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, validate_after=DB_POOL_VALIDATE_AFTER):
+        self.connect_kwargs = connect_kwargs
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.validate_after = validate_after
+
+        self._cond = threading.Condition()
+        self._idle = [] # (connection, last_used) pairs, most recently used last
+        self._size = 0 # Connections owned by the pool (idle + in use)
+        self._in_use = 0
+
+        self._stats = {
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "connects": 0,
+            "connect_failures": 0,
+            "reconnects": 0,
+            "discarded": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "connect_time_total": 0.0,
+        }
+
+        for _ in range(self.min_size):
+            try:
+                conn = self._connect()
+            except OperationalError as e:
+                print(f"Database pool warm-up failed: {e}")
+                break
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        start = time.monotonic()
+        try:
+            conn = psycopg2.connect(connect_timeout=DB_CONNECT_TIMEOUT, **self.connect_kwargs)
+        except OperationalError:
+            with self._cond:
+                self._stats["connect_failures"] += 1
+            raise
+        elapsed = time.monotonic() - start
+        DB_CONNECT_LATENCY.observe(elapsed)
+        with self._cond:
+            self._stats["connects"] += 1
+            self._stats["connect_time_total"] += elapsed
+        return conn
+
+    def _is_usable(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.validate_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (OperationalError, InterfaceError):
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        """Check out a validated connection, opening a new one if the pool has room."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["checkout_failures"] += 1
+                    raise PoolExhausted(f"No database connection available within {self.timeout}s")
+                self._cond.wait(remaining)
+
+            if self._idle:
+                conn, last_used = self._idle.pop()
+            else:
+                conn, last_used = None, None
+            # Reserve the slot before doing any network I/O outside the lock
+            self._in_use += 1
+            if conn is None:
+                self._size += 1
+
+        try:
+            if conn is not None and not self._is_usable(conn, last_used):
+                self._close_quietly(conn)
+                conn = None
+                with self._cond:
+                    self._stats["reconnects"] += 1
+            if conn is None:
+                conn = self._connect()
+        except OperationalError:
+            with self._cond:
+                self._in_use -= 1
+                self._size -= 1
+                self._stats["checkout_failures"] += 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, or close it if it is broken or 'discard' is set."""
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection that is still inside a transaction
+                conn.rollback()
+            except (OperationalError, InterfaceError):
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it.
+        A connection that raised OperationalError/InterfaceError is treated as stale and discarded.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except (OperationalError, InterfaceError):
+            self.putconn(conn, discard=True)
+            raise
+        except Exception:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def run(self, func, retries=1):
+        """
+        Call func(conn) with a pooled connection. If the connection turns out to be stale
+        (the server closed it while idle), retry on a fresh one. Only use for idempotent work.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    start = time.perf_counter()
+                    try:
+                        return func(conn)
+                    finally:
+                        DB_QUERY_LATENCY.labels(func.__name__).observe(time.perf_counter() - start)
+            except (OperationalError, InterfaceError) as e:
+                if attempt == retries:
+                    raise
+                print(f"Database connection error, retrying on a new connection: {e}")
+                with self._cond:
+                    self._stats["reconnects"] += 1
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "pid": os.getpid(),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+            })
+        checkouts = stats["checkouts"] or 1
+        stats["wait_time_avg"] = stats["wait_time_total"] / checkouts
+        stats["connect_time_avg"] = stats["connect_time_total"] / (stats["connects"] or 1)
+        return stats
+
+def connect_kwargs():
+    return {
+        "host": os.environ.get("DB_HOST"),
+        "port": int(os.environ.get("DB_PORT", 5432)),
+        "database": os.environ.get("DB_NAME"),
+        "user": os.environ.get("DB_USER"),
+        "password": os.environ.get("DB_PASSWORD"), # From Secrets Manager
+    }
+
+def connect_dedicated(statement_timeout_ms):
+    """
+    Open a connection outside the pool (e.g. for the health prober), with a server-side statement timeout
+    and TCP keepalives so a dead peer is noticed even while a query waits for its reply.
+    """
+    return psycopg2.connect(
+        connect_timeout=DB_CONNECT_TIMEOUT,
+        options=f"-c statement_timeout={int(statement_timeout_ms)}",
+        keepalives=1, keepalives_idle=5, keepalives_interval=2, keepalives_count=2,
+        **connect_kwargs(),
+    )
+
+# One pool per process. Gunicorn forks workers after the master imports the app,
+# so the pool is created lazily on first use and re-created if the PID changes.
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            # Connections inherited from a parent process must not be used (or closed) here
+            _pool = ConnectionPool(connect_kwargs())
+            _pool_pid = pid
+    return _pool
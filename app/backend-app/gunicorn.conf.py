@@ -0,0 +1,30 @@
+# app/backend-app/gunicorn.conf.py
+
+# Gunicorn loads ./gunicorn.conf.py automatically, so this applies to the CMD in the Dockerfile.
+# Worker count, backlog and max_requests are derived from the container's CPU and memory limits
+# (see app/common/gunicorn_sizing.py), so the same image fits any ECS task size. The worker class and
+# threads are fixed below for the app's I/O-bound workload. Every value can be overridden with a
+# GUNICORN_* environment variable.
+
+import os
+import sys
+
+# Shared modules live in app/common, next to this app's directory (in the repo and in the image)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+from gunicorn_sizing import ( # noqa: E402
+    async_workers, child_exit, cpu_limit, default_workers, on_starting, prepare_prometheus_dir, tuned_settings,
+)
+
+prometheus_dir = prepare_prometheus_dir()
+cpus = cpu_limit()
+backend_mode = os.environ.get("BACKEND_MODE", "sync")
+
+if backend_mode == "async":
+    globals().update(tuned_settings(cpus, "uvicorn.workers.UvicornWorker", async_workers(cpus), 1, worker_memory_mb=64))
+else:
+    # The app mostly waits on the database, so threads add concurrency without the memory of extra processes
+    globals().update(tuned_settings(cpus, "gthread", default_workers(cpus), 4, worker_memory_mb=64))
+
+wsgi_app = "asgi:app" if backend_mode == "async" else "app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
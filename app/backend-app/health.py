@@ -0,0 +1,111 @@
+# app/backend-app/health.py
+
+# Deep health checks for the backend.
+# A background prober checks the database on a fixed interval and caches the result,
+# so health requests only read memory and never wait on the network.
+
+import os
+import threading
+import time
+
+HEALTH_PROBE_INTERVAL = float(os.environ.get("HEALTH_PROBE_INTERVAL", 10)) # Seconds between DB probes
+HEALTH_TTL = float(os.environ.get("HEALTH_TTL", 30)) # Cached results older than this are reported as stale
+HEALTH_FAILED_AFTER = float(os.environ.get("HEALTH_FAILED_AFTER", 2 * HEALTH_TTL)) # Results older than this report 'failed'
+HEALTH_PROBE_TIMEOUT = float(os.environ.get("HEALTH_PROBE_TIMEOUT", 2)) # Statement timeout of the probe's own DB connection
+HEALTH_DEGRADED_LATENCY_MS = float(os.environ.get("HEALTH_DEGRADED_LATENCY_MS", 250)) # Slower probes report 'degraded'
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+FAILED = "failed"
+STARTING = "starting"
+
+# HTTP status per health status: degraded still serves traffic, so the load balancer keeps the task
+STATUS_CODES = {HEALTHY: 200, DEGRADED: 200, FAILED: 503, STARTING: 503}
+
+class HealthCache:
+    """Holds the latest probe result and applies the TTL when it is read."""
+
+    def __init__(self, ttl=HEALTH_TTL, degraded_latency_ms=HEALTH_DEGRADED_LATENCY_MS, failed_after=HEALTH_FAILED_AFTER):
+        self.ttl = ttl
+        self.failed_after = failed_after
+        self.degraded_latency_ms = degraded_latency_ms
+        self._result = None # Replaced atomically, so readers never need a lock
+
+    def record(self, latency_ms=None, error=None):
+        if error is not None:
+            status = FAILED
+        elif latency_ms > self.degraded_latency_ms:
+            status = DEGRADED
+        else:
+            status = HEALTHY
+        self._result = {
+            "status": status,
+            "db_reachable": error is None,
+            "db_latency_ms": None if latency_ms is None else round(latency_ms, 2),
+            "error": None if error is None else str(error),
+            "checked_at": time.time(),
+        }
+
+    def snapshot(self):
+        result = self._result
+        if result is None:
+            return {"status": STARTING, "db_reachable": None, "db_latency_ms": None, "error": None, "checked_at": None, "age_seconds": None}
+        snapshot = dict(result)
+        snapshot["age_seconds"] = round(time.time() - result["checked_at"], 3)
+        if snapshot["age_seconds"] > self.failed_after:
+            # The prober is stuck (e.g. on a connection that never answers): stop reporting the task as serving
+            snapshot["status"] = FAILED
+            snapshot["error"] = f"Health result is stale: no probe has finished for {snapshot['age_seconds']:.0f}s"
+        elif snapshot["age_seconds"] > self.ttl and snapshot["status"] == HEALTHY:
+            # The prober has stopped reporting, so the last good result can no longer be trusted
+            snapshot["status"] = DEGRADED
+            snapshot["error"] = "Health result is stale"
+        return snapshot
+
+class HealthProber:
+    """Daemon thread that runs probe_fn every interval and records its latency or error."""
+
+    def __init__(self, probe_fn, cache=None, interval=HEALTH_PROBE_INTERVAL):
+        self.probe_fn = probe_fn
+        self.cache = cache or HealthCache()
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def probe_once(self):
+        start = time.monotonic()
+        try:
+            self.probe_fn()
+        except Exception as e:
+            print(f"Health probe failed: {e}")
+            self.cache.record(error=e)
+        else:
+            self.cache.record(latency_ms=(time.monotonic() - start) * 1000)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_once()
+            self._stop.wait(self.interval)
+
+# Threads do not survive fork, so each gunicorn worker starts its own prober on first use.
+_prober = None
+_prober_pid = None
+_prober_lock = threading.Lock()
+
+def get_prober(probe_fn):
+    global _prober, _prober_pid
+    pid = os.getpid()
+    if _prober is not None and _prober_pid == pid:
+        return _prober
+    with _prober_lock:
+        if _prober is None or _prober_pid != pid:
+            _prober = HealthProber(probe_fn).start()
+            _prober_pid = pid
+    return _prober
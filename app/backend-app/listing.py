@@ -0,0 +1,142 @@
+# app/backend-app/listing.py
+
+# Streaming list endpoints (e.g. GET /items?after=<id>&limit=<n>).
+# Rows are read through a server-side (named) cursor, LIST_FETCH_SIZE rows per round trip, and written
+# to the client as they arrive, so a worker's memory stays flat however many rows a page has and the
+# first bytes go out after the first fetch. Pages use keyset pagination: the response ends with
+# "next_after", the key to pass as ?after= for the next page (null on the last page).
+#
+# Response: {"items":[{...},{...}],"count":<rows in this page>,"next_after":<key or null>}
+
+import json
+import os
+import time
+import uuid
+
+from psycopg2 import InterfaceError, OperationalError
+
+from db_pool import get_pool
+from metrics import DB_QUERY_LATENCY
+
+LIST_DEFAULT_LIMIT = int(os.environ.get("LIST_DEFAULT_LIMIT", 100))
+LIST_MAX_LIMIT = int(os.environ.get("LIST_MAX_LIMIT", 100000))
+LIST_FETCH_SIZE = int(os.environ.get("LIST_FETCH_SIZE", 1000)) # Rows per FETCH from the server-side cursor
+
+# Tables exposed as list endpoints. Only names from here are put into SQL.
+# "key" must be unique and indexed (e.g. the primary key): pages are "key > after ORDER BY key".
+RESOURCES = {
+    "items": {"table": "items", "key": "id", "columns": ("id", "name", "created_at")},
+}
+
+class BadRequest(ValueError):
+    """Raised for invalid pagination parameters."""
+
+def parse_page_args(args):
+    """Returns (after, limit) from the query string."""
+    try:
+        after = int(args["after"]) if args.get("after") not in (None, "") else None
+        limit = int(args.get("limit") or LIST_DEFAULT_LIMIT)
+    except ValueError:
+        raise BadRequest("'after' and 'limit' must be integers")
+    if not 1 <= limit <= LIST_MAX_LIMIT:
+        raise BadRequest(f"'limit' must be between 1 and {LIST_MAX_LIMIT}")
+    return after, limit
+
+def build_query(resource, after, placeholders=("%s", "%s")):
+    """SQL and parameters for one page; placeholders differ between psycopg2 (%s) and asyncpg ($1)."""
+    spec = RESOURCES[resource]
+    quote = lambda name: f'"{name}"'
+    columns = ", ".join(quote(column) for column in spec["columns"])
+    key = quote(spec["key"])
+    if after is None:
+        return f"SELECT {columns} FROM {quote(spec['table'])} ORDER BY {key} LIMIT {placeholders[0]}", ()
+    return (f"SELECT {columns} FROM {quote(spec['table'])} WHERE {key} > {placeholders[0]} "
+            f"ORDER BY {key} LIMIT {placeholders[1]}"), (after,)
+
+def _json_default(value):
+    # Timestamps and dates as ISO 8601, anything else (e.g. Decimal) as its string form
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+def encode_rows(columns, rows, first):
+    """One response chunk: the rows as JSON objects, comma-separated from the previous chunk."""
+    chunk = ",".join(json.dumps(dict(zip(columns, row)), separators=(",", ":"), default=_json_default) for row in rows)
+    return chunk if first else "," + chunk
+
+def page_end(count, limit, last_key):
+    next_after = last_key if count == limit else None
+    return f'],"count":{count},"next_after":{json.dumps(next_after, default=_json_default)}}}\n'
+
+class RowStream:
+    """
+    Response body for a streamed page. Closing it (which the WSGI server always does, even when
+    the client disconnects before the body is sent) returns the pooled connection.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._head = next(chunks) # Enter the generator so close() always reaches its cleanup
+
+    def __iter__(self):
+        yield self._head
+        yield from self._chunks
+
+    def close(self):
+        self._chunks.close()
+
+def open_stream(resource, after, limit, retries=1):
+    """
+    Runs the query and fetches the first rows before returning, so connection and query errors
+    still turn into an error status. Returns a RowStream of JSON chunks that holds the pooled
+    connection until the last row is sent (or the client goes away) and then returns it.
+    """
+    spec = RESOURCES[resource]
+    query, params = build_query(resource, after)
+    pool = get_pool()
+    for attempt in range(retries + 1):
+        conn = pool.getconn()
+        try:
+            start = time.perf_counter()
+            # A named cursor runs DECLARE ... CURSOR and FETCHes on demand instead of loading every row
+            cursor = conn.cursor(name=f"list_{resource}_{uuid.uuid4().hex[:12]}")
+            cursor.itersize = LIST_FETCH_SIZE
+            cursor.execute(query, params + (limit,))
+            rows = cursor.fetchmany(LIST_FETCH_SIZE)
+            DB_QUERY_LATENCY.labels(f"list_{resource}").observe(time.perf_counter() - start)
+            break
+        except (OperationalError, InterfaceError) as e:
+            pool.putconn(conn, discard=True)
+            if attempt == retries:
+                raise
+            print(f"Database connection error, retrying on a new connection: {e}")
+        except Exception:
+            pool.putconn(conn)
+            raise
+
+    def generate():
+        discard = False
+        count, last_key = 0, None
+        key_index = spec["columns"].index(spec["key"])
+        try:
+            yield '{"items":['
+            batch = rows
+            while batch:
+                yield encode_rows(spec["columns"], batch, first=count == 0)
+                count += len(batch)
+                last_key = batch[-1][key_index]
+                if len(batch) < LIST_FETCH_SIZE:
+                    break # The cursor is exhausted; skip the empty FETCH
+                batch = cursor.fetchmany(LIST_FETCH_SIZE)
+            yield page_end(count, limit, last_key)
+        except (OperationalError, InterfaceError) as e:
+            # Headers are already sent, so the client sees a truncated body rather than an error status
+            discard = True
+            print(f"Database error while streaming {resource}: {e}")
+            raise
+        finally:
+            try:
+                cursor.close()
+            except (OperationalError, InterfaceError):
+                discard = True
+            pool.putconn(conn, discard=discard)
+
+    return RowStream(generate())
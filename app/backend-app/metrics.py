@@ -0,0 +1,14 @@
+# app/backend-app/metrics.py
+
+# Prometheus metrics for the backend, served at /metrics.
+# The HTTP request metrics and the /metrics endpoint are shared with the frontend (app/common/http_metrics.py);
+# the database metrics below are the backend's own.
+
+from prometheus_client import Histogram
+
+from http_metrics import ( # noqa: F401 (re-exported for app.py and asgi.py)
+    IN_FLIGHT, LATENCY_BUCKETS, init_app, observe_request, render_metrics,
+)
+
+DB_CONNECT_LATENCY = Histogram("db_connect_duration_seconds", "Time to open a new database connection", buckets=LATENCY_BUCKETS)
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Time spent running database work on a pooled connection", ["query"], buckets=LATENCY_BUCKETS)
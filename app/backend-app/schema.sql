@@ -0,0 +1,10 @@
+-- app/backend-app/schema.sql
+
+-- Tables behind the backend's list endpoints (see listing.py).
+-- Pages are read in primary-key order ("id" > after ORDER BY "id"), so no extra index is needed.
+
+CREATE TABLE IF NOT EXISTS items (
+    id         BIGSERIAL PRIMARY KEY,
+    name       TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
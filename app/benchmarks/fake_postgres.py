@@ -0,0 +1,209 @@
+# app/benchmarks/fake_postgres.py
+
+# Minimal PostgreSQL wire-protocol server used as a stand-in for RDS in benchmarks.
+# It speaks just enough of the simple query protocol for psycopg2 (the backend's sync mode):
+# trust authentication, BEGIN/COMMIT/ROLLBACK, and canned results for the backend's queries,
+# with a configurable per-query delay to mimic network and query time.
+# The "items" table behind the list endpoints is generated on the fly (ids 1..--rows) and read
+# through DECLARE/FETCH/CLOSE, as psycopg2's named cursors do.
+# The async mode (asyncpg) uses the extended protocol, so benchmark it against a real Postgres.
+#
+# Usage: python fake_postgres.py --port 55432 --latency-ms 2 --rows 100000
+
+import argparse
+import re
+import socketserver
+import struct
+import threading
+import time
+
+SERVER_PARAMETERS = {
+    "server_version": "15.4",
+    "server_encoding": "UTF8",
+    "client_encoding": "UTF8",
+    "DateStyle": "ISO, MDY",
+    "integer_datetimes": "on",
+    "standard_conforming_strings": "on",
+    "TimeZone": "UTC",
+}
+
+# Postgres type OIDs used in row descriptions
+INT4_OID = 23
+INT8_OID = 20
+TEXT_OID = 25
+TIMESTAMPTZ_OID = 1184
+
+ITEMS_COLUMNS = {"id": INT8_OID, "name": TEXT_OID, "created_at": TIMESTAMPTZ_OID}
+ITEMS_CREATED_AT = "2024-01-01 00:00:00+00"
+
+DECLARE_RE = re.compile(
+    r'DECLARE\s+"?(?P<name>\w+)"?\s+CURSOR\s+(?:WITHOUT\s+HOLD\s+)?FOR\s+SELECT\s+(?P<columns>.+?)\s+FROM\s+"?items"?'
+    r'(?:\s+WHERE\s+"?id"?\s*>\s*(?P<after>-?\d+))?\s+ORDER\s+BY\s+"?id"?\s+LIMIT\s+(?P<limit>\d+)$',
+    re.IGNORECASE | re.DOTALL,
+)
+FETCH_RE = re.compile(r'FETCH\s+(?:FORWARD\s+)?(?P<count>\d+)\s+FROM\s+"?(?P<name>\w+)"?$', re.IGNORECASE)
+CLOSE_RE = re.compile(r'CLOSE\s+"?(?P<name>\w+)"?$', re.IGNORECASE)
+
+def message(kind, payload=b""):
+    return kind + struct.pack("!I", len(payload) + 4) + payload
+
+def cstring(value):
+    return value.encode() + b"\x00"
+
+def row_description(columns):
+    payload = struct.pack("!H", len(columns))
+    for name, type_oid in columns:
+        payload += cstring(name) + struct.pack("!IHIhih", 0, 0, type_oid, -1, -1, 0)
+    return message(b"T", payload)
+
+def data_row(values):
+    payload = struct.pack("!H", len(values))
+    for value in values:
+        if value is None:
+            payload += struct.pack("!i", -1)
+        else:
+            encoded = str(value).encode()
+            payload += struct.pack("!I", len(encoded)) + encoded
+    return message(b"D", payload)
+
+def command_complete(tag):
+    return message(b"C", cstring(tag))
+
+def ready_for_query(status):
+    return message(b"Z", status)
+
+def error_response(text):
+    payload = b"SERROR\x00" + b"C42601\x00" + b"M" + cstring(text) + b"\x00"
+    return message(b"E", payload)
+
+def rows_result(columns, rows):
+    out = row_description(columns)
+    for row in rows:
+        out += data_row(row)
+    return out + command_complete(f"SELECT {len(rows)}")
+
+class FakePostgresHandler(socketserver.BaseRequestHandler):
+    latency = 0.0
+    rows = 100000 # Rows in the generated "items" table
+
+    def item(self, item_id, columns):
+        values = {"id": item_id, "name": f"item-{item_id}", "created_at": ITEMS_CREATED_AT}
+        return tuple(values[column] for column in columns)
+
+    def cursor_command(self, statement):
+        """Handles DECLARE/FETCH/CLOSE on the generated items table, or returns None."""
+        declare = DECLARE_RE.match(statement)
+        if declare:
+            columns = [column.strip().strip('"') for column in declare["columns"].split(",")]
+            if any(column not in ITEMS_COLUMNS for column in columns):
+                return None
+            first = max(int(declare["after"] or 0) + 1, 1)
+            last = min(first + int(declare["limit"]) - 1, self.rows)
+            self.cursors[declare["name"]] = [columns, first, last]
+            return command_complete("DECLARE CURSOR")
+        fetch = FETCH_RE.match(statement)
+        if fetch and fetch["name"] in self.cursors:
+            cursor = self.cursors[fetch["name"]]
+            columns, first, last = cursor
+            end = min(first + int(fetch["count"]) - 1, last)
+            out = row_description([(column, ITEMS_COLUMNS[column]) for column in columns])
+            out += b"".join(data_row(self.item(item_id, columns)) for item_id in range(first, end + 1))
+            cursor[1] = end + 1
+            return out + command_complete(f"FETCH {max(end - first + 1, 0)}")
+        close = CLOSE_RE.match(statement)
+        if close and self.cursors.pop(close["name"], None) is not None:
+            return command_complete("CLOSE CURSOR")
+        return None
+
+    def recv_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client closed connection")
+            data += chunk
+        return data
+
+    def handle(self):
+        try:
+            self.startup()
+            self.in_transaction = False
+            self.cursors = {}
+            while True:
+                kind = self.recv_exact(1)
+                length, = struct.unpack("!I", self.recv_exact(4))
+                payload = self.recv_exact(length - 4)
+                if kind == b"X": # Terminate
+                    return
+                if kind == b"Q":
+                    self.request.sendall(self.simple_query(payload.rstrip(b"\x00").decode()))
+                else:
+                    self.request.sendall(error_response("fake_postgres only supports the simple query protocol") + ready_for_query(b"I"))
+        except (ConnectionError, OSError):
+            return
+
+    def startup(self):
+        while True:
+            length, = struct.unpack("!I", self.recv_exact(4))
+            payload = self.recv_exact(length - 4)
+            code, = struct.unpack("!I", payload[:4])
+            if code in (80877103, 80877104): # SSLRequest / GSSENCRequest: not supported, continue in plain text
+                self.request.sendall(b"N")
+                continue
+            break
+        out = message(b"R", struct.pack("!I", 0)) # AuthenticationOk
+        for name, value in SERVER_PARAMETERS.items():
+            out += message(b"S", cstring(name) + cstring(value))
+        out += message(b"K", struct.pack("!II", threading.get_ident() & 0x7FFFFFFF, 0))
+        out += ready_for_query(b"I")
+        self.request.sendall(out)
+
+    def simple_query(self, sql):
+        statement = sql.strip().rstrip(";").strip()
+        upper = statement.upper()
+        if upper in ("BEGIN", "START TRANSACTION"):
+            self.in_transaction = True
+            return command_complete("BEGIN") + ready_for_query(b"T")
+        if upper in ("COMMIT", "ROLLBACK"):
+            self.in_transaction = False
+            self.cursors.clear() # Cursors without hold end with their transaction
+            return command_complete(upper) + ready_for_query(b"I")
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        status = b"T" if self.in_transaction else b"I"
+        if upper == "SELECT 1":
+            return rows_result([("?column?", INT4_OID)], [(1,)]) + ready_for_query(status)
+        if upper.startswith("SELECT VERSION()"):
+            result = rows_result(
+                [("version", TEXT_OID), ("current_database", TEXT_OID), ("pg_database_size", INT8_OID)],
+                [("PostgreSQL 15.4 (fake_postgres)", "benchmark", 8 * 1024 * 1024)],
+            )
+            return result + ready_for_query(status)
+        if upper.startswith("SET") or upper.startswith("SHOW"):
+            return command_complete("SET") + ready_for_query(status)
+        if self.in_transaction:
+            result = self.cursor_command(statement)
+            if result is not None:
+                return result + ready_for_query(status)
+        return error_response(f"fake_postgres cannot answer: {statement[:80]}") + ready_for_query(b"E" if self.in_transaction else b"I")
+
+class FakePostgresServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(host="127.0.0.1", port=55432, latency_ms=0.0, rows=100000):
+    handler = type("Handler", (FakePostgresHandler,), {"latency": latency_ms / 1000.0, "rows": rows})
+    server = FakePostgresServer((host, port), handler)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake PostgreSQL server for local benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=55432)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every query")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the generated items table")
+    args = parser.parse_args()
+    print(f"fake_postgres listening on {args.host}:{args.port} (latency {args.latency_ms}ms, {args.rows} items)")
+    serve(args.host, args.port, args.latency_ms, args.rows)
@@ -0,0 +1,168 @@
+# app/benchmarks/startup_timing.py
+
+# Startup-timing probe for the frontend and backend apps.
+# Each run starts the app fresh and measures the time from launch to the first 200 from /health,
+# i.e. how long a new ECS task takes before the load balancer can start checking it.
+#   - With --backend-image/--frontend-image it runs the built image ("docker run" to first healthy
+#     response, which includes container creation) and also reports the image size.
+#   - Without an image it runs gunicorn from the app directory with the app's own gunicorn.conf.py,
+#     which isolates Python start-up and import time from Docker.
+# /health touches neither the database nor the backend, so nothing else needs to be running.
+#
+# Usage (from the repo root):
+#   docker build -f app/backend-app/Dockerfile -t backend-app app && docker build -f app/frontend-app/Dockerfile -t frontend-app app
+#   python app/benchmarks/startup_timing.py --backend-image backend-app --frontend-image frontend-app --runs 10
+#   python app/benchmarks/startup_timing.py --runs 10 --output startup.json
+#   python app/benchmarks/startup_timing.py --runs 10 --baseline startup.json --max-regression 0.2   # exits 1 on regression
+
+import argparse
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIRS = {
+    "backend": os.path.join(BENCHMARKS_DIR, "..", "backend-app"),
+    "frontend": os.path.join(BENCHMARKS_DIR, "..", "frontend-app"),
+}
+CONTAINER_PORTS = {"backend": 5000, "frontend": 8000} # EXPOSE in each Dockerfile
+# Enough for the apps to import; /health does not use them
+APP_ENV = {
+    "backend": {"DB_HOST": "127.0.0.1", "DB_NAME": "startup", "DB_USER": "startup", "DB_PASSWORD": "startup"},
+    "frontend": {"BACKEND_URL": "http://127.0.0.1:9"},
+}
+POLL_INTERVAL = 0.01
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100.0 * len(values)) - 1))]
+
+def wait_until_healthy(port, started, timeout, process=None):
+    """Seconds from 'started' to the first 200 from /health."""
+    deadline = started + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                if response.status == 200:
+                    return time.monotonic() - started
+        except Exception:
+            pass
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before becoming healthy")
+        time.sleep(POLL_INTERVAL)
+    raise RuntimeError(f"No healthy response on port {port} within {timeout}s")
+
+def run_local(app, env, timeout):
+    port = free_port()
+    process_env = dict(os.environ)
+    process_env.update(APP_ENV[app])
+    process_env.update(env)
+    process_env["PORT"] = str(port)
+    process_env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix=f"startup-{app}-prom-")
+    started = time.monotonic()
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn"], cwd=APP_DIRS[app], env=process_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        return wait_until_healthy(port, started, timeout, process)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(process_env["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
+def run_container(app, image, env, timeout, docker_args):
+    port = free_port()
+    command = ["docker", "run", "-d", "-p", f"127.0.0.1:{port}:{CONTAINER_PORTS[app]}"] + docker_args
+    for name, value in dict(APP_ENV[app], **env).items():
+        command += ["-e", f"{name}={value}"]
+    started = time.monotonic()
+    container = subprocess.run(command + [image], capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return wait_until_healthy(port, started, timeout)
+    finally:
+        subprocess.run(["docker", "rm", "-f", container], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def image_size_mb(image):
+    size = subprocess.run(["docker", "image", "inspect", "-f", "{{.Size}}", image],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    return round(int(size) / (1024 * 1024), 1)
+
+def parse_env(pairs):
+    env = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        env[name] = value
+    return env
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time from start to first healthy response for the apps")
+    parser.add_argument("--apps", default="backend,frontend", help="Comma-separated apps to measure")
+    parser.add_argument("--backend-image", help="Run this image instead of gunicorn from app/backend-app")
+    parser.add_argument("--frontend-image", help="Run this image instead of gunicorn from app/frontend-app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the first healthy response")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="Environment variable for the app (repeatable)")
+    parser.add_argument("--docker-arg", action="append", default=[], help="Extra 'docker run' argument, e.g. --docker-arg=--cpus=1")
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p50 slowdown vs. baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    env = parse_env(args.env)
+    images = {"backend": args.backend_image, "frontend": args.frontend_image}
+    report = {"python": sys.version.split()[0], "runs": args.runs, "apps": {}}
+    for app in [name.strip() for name in args.apps.split(",") if name.strip()]:
+        image = images[app]
+        if image:
+            seconds = [run_container(app, image, env, args.timeout, args.docker_arg) for _ in range(args.runs)]
+        else:
+            seconds = [run_local(app, env, args.timeout) for _ in range(args.runs)]
+        values = [s * 1000 for s in seconds]
+        result = {"mode": "docker" if image else "local",
+                  "start_to_healthy_ms": {"p50": round(percentile(values, 50), 1), "p90": round(percentile(values, 90), 1),
+                                          "min": round(min(values), 1), "max": round(max(values), 1)}}
+        if image:
+            result["image"] = image
+            result["image_size_mb"] = image_size_mb(image)
+        report["apps"][app] = result
+        print(f"{app} ({result['mode']}): p50 {result['start_to_healthy_ms']['p50']}ms to first healthy response", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["apps"]
+        regressed = False
+        for app, result in report["apps"].items():
+            if app not in baseline:
+                continue
+            before = baseline[app]["start_to_healthy_ms"]["p50"]
+            current = result["start_to_healthy_ms"]["p50"]
+            change = (current - before) / before
+            print(f"{app} start-to-healthy p50: {current}ms vs. baseline {before}ms ({change:+.1%})", file=sys.stderr)
+            regressed = regressed or change > args.max_regression
+        if regressed:
+            print("Startup regression exceeds the allowed threshold", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# app/common/gunicorn_sizing.py
+
+# Gunicorn sizing shared by the frontend and backend gunicorn.conf.py files.
+# Worker count, backlog and max_requests are derived from the CPU and memory the container may use,
+# so the same image fits any ECS task size. Every value can be overridden with a GUNICORN_* environment variable.
+#
+# The worker class is not derived from the limits: each gunicorn.conf.py picks it for the app's workload.
+# Both apps mostly wait on the network (the database or the backend), so they use gthread (or uvicorn in
+# the backend's async mode) at every task size. Falling back to sync workers on small tasks would leave
+# each worker able to serve one request at a time, which is where a small task can least afford it.
+#
+# CPUs are taken from, in order:
+#   1. the cgroup CFS quota: docker --cpus, Fargate, or a task-level 'cpu' on ECS EC2
+#   2. the container's 'cpu' units from the ECS task metadata endpoint. On ECS EC2 a container-level
+#      'cpu' is only a CPU-shares weight, not a quota, so cgroups alone would report every CPU of the
+#      host. The reservation (units / 1024) is what the container can count on when the host is busy.
+#   3. the CPUs the process may run on
+
+import json
+import math
+import os
+import shutil
+import urllib.request
+
+ECS_METADATA_TIMEOUT = 0.5 # Seconds; the endpoint is local to the host
+
+_detected = {} # cpus and memory_mb, for the start-up log line
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def prepare_prometheus_dir():
+    """
+    Prometheus multiprocess mode: each worker writes its metrics to files in this directory.
+    Called from gunicorn.conf.py, before the app (and prometheus_client) is imported, and wiped on
+    start so samples from a previous run of the container are not reported again.
+    """
+    prometheus_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if prometheus_dir:
+        shutil.rmtree(prometheus_dir, ignore_errors=True)
+        os.makedirs(prometheus_dir, exist_ok=True)
+    return prometheus_dir
+
+def host_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def ecs_cpu_reservation():
+    """vCPUs reserved by this container's ECS 'cpu' units, or None outside ECS or when not set."""
+    uri = os.environ.get("ECS_CONTAINER_METADATA_URI_V4")
+    if not uri:
+        return None
+    try:
+        with urllib.request.urlopen(uri, timeout=ECS_METADATA_TIMEOUT) as response:
+            units = (json.load(response).get("Limits") or {}).get("CPU") or 0
+    except (OSError, ValueError):
+        return None
+    return units / 1024 if units > 0 else None
+
+def cpu_limit():
+    """CPUs available to the container (see the order above)."""
+    cpu_max = _read("/sys/fs/cgroup/cpu.max") # cgroup v2: "<quota> <period>" or "max <period>"
+    if cpu_max and not cpu_max.startswith("max"):
+        quota, period = cpu_max.split()
+        return int(quota) / int(period)
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") # cgroup v1
+    period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    reserved = ecs_cpu_reservation()
+    if reserved:
+        return min(reserved, host_cpus())
+    return host_cpus()
+
+def memory_limit_mb():
+    """Container memory limit in MB, falling back to the host's physical memory."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read(path)
+        # cgroup v1 reports "no limit" as a huge number, v2 as "max"
+        if value and value != "max" and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError):
+        return 1024
+
+def default_workers(cpus, per_cpu=2, extra=1):
+    return max(1, int(per_cpu * cpus + extra))
+
+def async_workers(cpus):
+    # One event loop per CPU; concurrency comes from the loop, not from more processes
+    return max(1, math.ceil(cpus))
+
+def tuned_settings(cpus, worker_class, workers, threads, worker_memory_mb):
+    """
+    Gunicorn settings for the given defaults, capped by the memory limit and overridable with
+    GUNICORN_* variables. gunicorn.conf.py puts the result into its module namespace.
+    worker_class and threads are used as given (threads only applies to gthread).
+    worker_memory_mb is roughly what one worker costs after preload (shared pages not counted twice).
+    """
+    memory_mb = memory_limit_mb()
+    _detected.update(cpus=cpus, memory_mb=memory_mb)
+
+    worker_memory_mb = env_int("GUNICORN_WORKER_MEMORY_MB", worker_memory_mb)
+    # Leave a quarter of the limit for the master process, page cache and spikes
+    max_workers_for_memory = max(1, int(memory_mb * 0.75) // worker_memory_mb)
+
+    worker_class = os.environ.get("GUNICORN_WORKER_CLASS", worker_class)
+    workers = env_int("GUNICORN_WORKERS", min(workers, max_workers_for_memory))
+    threads = env_int("GUNICORN_THREADS", threads if worker_class == "gthread" else 1)
+
+    # Enough queued connections to absorb a burst, capped by the kernel's somaxconn
+    somaxconn = int(_read("/proc/sys/net/core/somaxconn") or 4096)
+    # Recycle workers periodically to bound slow memory growth; restart sooner when memory is tight
+    max_requests = env_int("GUNICORN_MAX_REQUESTS", 1000 if memory_mb < 512 else 5000)
+
+    return {
+        "worker_class": worker_class,
+        "workers": workers,
+        "threads": threads,
+        # Load the app once in the master so workers share its memory copy-on-write and start faster
+        "preload_app": os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true",
+        # Longer than the ALB's 60s idle timeout, so the ALB (not gunicorn) closes idle connections
+        "keepalive": env_int("GUNICORN_KEEPALIVE", 65),
+        "timeout": env_int("GUNICORN_TIMEOUT", 30),
+        "graceful_timeout": env_int("GUNICORN_GRACEFUL_TIMEOUT", 30),
+        "backlog": env_int("GUNICORN_BACKLOG", min(somaxconn, max(64, 64 * workers * threads))),
+        "max_requests": max_requests,
+        "max_requests_jitter": env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10),
+    }
+
+def on_starting(server):
+    # The effective settings, which command-line flags may have changed
+    cfg = server.cfg
+    print(f"Gunicorn tuned for {_detected.get('cpus', 0):g} CPU(s) and {_detected.get('memory_mb')} MB: "
+          f"workers={cfg.workers} worker_class={cfg.worker_class_str} threads={cfg.threads} "
+          f"keepalive={cfg.keepalive} backlog={cfg.backlog} max_requests={cfg.max_requests} preload={cfg.preload_app}")
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges (e.g. in-flight requests) from the aggregate
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,66 @@
+# app/common/http_metrics.py
+
+# Prometheus HTTP request metrics and the /metrics endpoint, shared by the frontend and backend.
+# When PROMETHEUS_MULTIPROC_DIR is set (see gunicorn_sizing.py and the Dockerfiles), every gunicorn worker
+# writes its samples to memory-mapped files in that directory and /metrics aggregates all of them,
+# so a scrape returns the totals for the whole task rather than for whichever worker answered.
+
+import os
+import time
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUEST_COUNT = Counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "HTTP response body size", ["route"], buckets=SIZE_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled", multiprocess_mode="livesum")
+
+def observe_request(method, route, status, start, size=None):
+    """Records one finished request; size is None for streamed responses, which have no length up front."""
+    REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+    REQUEST_COUNT.labels(method, route, str(status)).inc()
+    if size is not None:
+        RESPONSE_SIZE.labels(route).observe(size)
+
+def route_label():
+    # Use the URL rule rather than the raw path to keep label cardinality bounded
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+def _after_request(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        observe_request(request.method, route_label(), response.status_code, start, response.content_length)
+    return response
+
+def _teardown_request(exc):
+    # Runs even if the view raised, so the in-flight gauge cannot leak
+    IN_FLIGHT.dec()
+
+def render_metrics():
+    """Return (body, content_type) for the current metrics, aggregated across workers when possible."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def metrics_response():
+    body, content_type = render_metrics()
+    return body, 200, {"Content-Type": content_type}
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_response)
@@ -1,9 +1,14 @@
 # app/frontend-app/app.py
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, stream_with_context
 import os
+from urllib3.exceptions import HTTPError
+
+from backend_client import get_client, CircuitOpenError
+import http_metrics
 
 app = Flask(__name__)
+http_metrics.init_app(app) # Request metrics and the /metrics endpoint (app/common/http_metrics.py)
 
 @app.route('/')
 def hello_world():
@@ -16,6 +21,46 @@ def health_check():
     # Simple health check endpoint for the load balancer
     return jsonify({"status": "healthy"}), 200
 
+# Request/response headers passed through to and from the backend (everything else is hop-by-hop or not needed)
+FORWARDED_REQUEST_HEADERS = ("Content-Type", "Accept", "X-Request-ID")
+FORWARDED_RESPONSE_HEADERS = ("Content-Type", "Cache-Control", "X-Request-ID")
+
+@app.route('/api/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+@app.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+def proxy_to_backend(path):
+    # Forward /api/<path> to the backend over the pooled keep-alive client
+    headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+    try:
+        backend_response = get_client().request(
+            request.method,
+            path,
+            query=request.query_string.decode(),
+            body=request.get_data() or None,
+            headers=headers,
+        )
+    except CircuitOpenError as e:
+        print(f"Backend request rejected: {e}")
+        return jsonify({"error": "Backend temporarily unavailable."}), 503
+    except HTTPError as e:
+        print(f"Backend request failed: {e}")
+        return jsonify({"error": "Backend request failed."}), 502
+
+    def stream_body():
+        # Stream the body through and hand the connection back to the pool when done
+        try:
+            for chunk in backend_response.stream(64 * 1024):
+                yield chunk
+        finally:
+            backend_response.release_conn()
+
+    response_headers = {name: backend_response.headers[name] for name in FORWARDED_RESPONSE_HEADERS if name in backend_response.headers}
+    return Response(stream_with_context(stream_body()), status=backend_response.status, headers=response_headers)
+
+@app.route('/api-client/stats')
+def api_client_stats():
+    # Per-worker connection pool and circuit breaker statistics for tuning
+    return jsonify(get_client().stats()), 200
+
 if __name__ == '__main__':
     # Listen on all available interfaces (0.0.0.0) on the specified port
     # The container_port variable in Terraform will map to this.
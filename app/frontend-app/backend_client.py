@@ -0,0 +1,153 @@
+# app/frontend-app/backend_client.py
+
+# Pooled HTTP client for calls from the frontend to the backend (internal ALB).
+# Connections are kept alive and reused per host, retries are bounded and jittered,
+# and a circuit breaker stops sending traffic to a backend that keeps failing.
+
+import os
+import threading
+import time
+
+import urllib3
+from urllib3.exceptions import HTTPError
+from urllib3.util import Retry, Timeout
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:5000").rstrip("/") # Internal ALB, set by the ECS task definition
+BACKEND_POOL_MAXSIZE = int(os.environ.get("BACKEND_POOL_MAXSIZE", 10)) # Keep-alive connections per host, per worker
+BACKEND_CONNECT_TIMEOUT = float(os.environ.get("BACKEND_CONNECT_TIMEOUT", 1))
+BACKEND_READ_TIMEOUT = float(os.environ.get("BACKEND_READ_TIMEOUT", 5))
+BACKEND_RETRIES = int(os.environ.get("BACKEND_RETRIES", 2))
+BACKEND_RETRY_BACKOFF = float(os.environ.get("BACKEND_RETRY_BACKOFF", 0.1)) # Seconds; doubles per retry
+BACKEND_RETRY_JITTER = float(os.environ.get("BACKEND_RETRY_JITTER", 0.1)) # Up to this many random seconds added per retry
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", 5)) # Consecutive failures that open the breaker
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", 30)) # Seconds before a trial request is let through
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and the call was not attempted."""
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After 'failure_threshold' consecutive failures it opens
+    and rejects calls for 'reset_timeout' seconds, then lets one trial call through (half-open).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            self._trial_in_flight = False
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats["opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"state": self._state, "consecutive_failures": self._failures})
+        return stats
+
+class BackendClient:
+    def __init__(self, base_url=BACKEND_URL):
+        self.base_url = base_url
+        self.breaker = CircuitBreaker()
+        self.http = urllib3.PoolManager(
+            maxsize=BACKEND_POOL_MAXSIZE,
+            block=True, # Wait for a free connection instead of opening extras that are then thrown away
+            timeout=Timeout(connect=BACKEND_CONNECT_TIMEOUT, read=BACKEND_READ_TIMEOUT),
+            retries=Retry(
+                total=BACKEND_RETRIES,
+                backoff_factor=BACKEND_RETRY_BACKOFF,
+                backoff_jitter=BACKEND_RETRY_JITTER,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False, # Hand the last 5xx back to the caller instead of raising
+            ),
+        )
+
+    def request(self, method, path, query=None, body=None, headers=None):
+        """
+        Forward a request to the backend and return the unread urllib3 response.
+        The caller must read it and call release_conn() so the connection goes back to the pool.
+        Retries only apply to idempotent methods (urllib3's default allow-list).
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker is open for {self.base_url}")
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        if query:
+            url = f"{url}?{query}"
+        try:
+            response = self.http.request(method, url, body=body, headers=headers, preload_content=False)
+        except HTTPError:
+            self.breaker.record_failure()
+            raise
+        if response.status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def stats(self):
+        pools = {}
+        # PoolManager keeps one connection pool per scheme/host/port
+        for key in list(self.http.pools.keys()):
+            pool = self.http.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "maxsize": pool.pool.maxsize if pool.pool else 0,
+                # The queue is pre-filled with None placeholders; only real connections are idle
+                "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+            }
+        return {"pid": os.getpid(), "backend_url": self.base_url, "pools": pools, "circuit_breaker": self.breaker.stats()}
+
+# Sockets must not be shared across forked gunicorn workers, so each worker builds its own client.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = BackendClient()
+            _client_pid = pid
+    return _client
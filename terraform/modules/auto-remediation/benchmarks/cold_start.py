@@ -0,0 +1,140 @@
+# terraform/modules/auto-remediation/benchmarks/cold_start.py
+
+# Cold-start benchmark for the remediation Lambda.
+# Each run starts a fresh Python process (like a new Lambda container), then measures:
+#   import_ms        - importing main.py (module init)
+#   first_invoke_ms  - first lambda_handler call, including lazy client creation
+#   warm_invoke_ms   - a second call on the same container
+# AWS calls go to a local stub endpoint (stub_aws_endpoint.py), so no credentials or network are needed.
+# The stub tracks instance state, so each run gets a fresh one and does the same work.
+#
+# Usage:
+#   python cold_start.py --runs 20 --output cold_start.json
+#   python cold_start.py --runs 20 --baseline cold_start.json --max-regression 0.2   # exits 1 on regression
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+
+from stub_aws_endpoint import serve
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_function_code")
+RESULT_MARKER = "COLD_START_RESULT "
+
+SG_EVENT = {
+    "id": "cold-start-sg",
+    "detail": {
+        "eventName": "AuthorizeSecurityGroupIngress",
+        "requestParameters": {
+            "groupId": "sg-0123456789abcdef0",
+            "ipPermissions": {"items": [{"ipProtocol": "tcp", "fromPort": 22, "toPort": 22,
+                                         "ipRanges": {"items": [{"cidrIp": "0.0.0.0/0"}]}}]},
+        },
+        "responseElements": {},
+    },
+}
+
+RUN_INSTANCES_EVENT = {
+    "id": "cold-start-run",
+    "detail": {
+        "eventName": "RunInstances",
+        "requestParameters": {"instancesSet": {"items": [{"imageId": "ami-unapproved"}]}},
+        "responseElements": {"instancesSet": {"items": [{"instanceId": "i-0123456789abcdef0"}]}},
+    },
+}
+
+# Runs inside the fresh process
+MEASURE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {LAMBDA_DIR!r})
+import main
+t1 = time.perf_counter()
+first = main.lambda_handler({SG_EVENT!r}, None)
+t2 = time.perf_counter()
+warm = main.lambda_handler({RUN_INSTANCES_EVENT!r}, None)
+t3 = time.perf_counter()
+sys.stderr.write({RESULT_MARKER!r} + json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "first_invoke_ms": (t2 - t1) * 1000,
+    "warm_invoke_ms": (t3 - t2) * 1000,
+    "first_status": first.get("status"),
+    "warm_status": warm.get("status"),
+}}) + "\\n")
+"""
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100.0 * len(values)) - 1))]
+
+def run_once(calls_total):
+    """One cold start against its own stub; adds the run's AWS calls to calls_total."""
+    server, calls = serve()
+    try:
+        return measure(f"http://127.0.0.1:{server.server_address[1]}")
+    finally:
+        server.shutdown()
+        server.server_close()
+        for action, count in calls.items():
+            calls_total[action] = calls_total.get(action, 0) + count
+
+def measure(endpoint):
+    env = dict(os.environ)
+    env.update({
+        "AWS_ENDPOINT_URL_EC2": endpoint,
+        "AWS_ACCESS_KEY_ID": "stub",
+        "AWS_SECRET_ACCESS_KEY": "stub",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "APPROVED_AMI_ID": "ami-approved",
+    })
+    env.pop("REMEDIATION_STATE_TABLE", None) # Keep state local
+    completed = subprocess.run([sys.executable, "-c", MEASURE], env=env, capture_output=True, text=True, check=True)
+    for line in completed.stderr.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f"No result from benchmark process:\n{completed.stderr}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure remediation Lambda cold-start time against a stub EC2 endpoint")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p50 slowdown vs. baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    calls = {}
+    runs = [run_once(calls) for _ in range(args.runs)]
+
+    summary = {}
+    for metric in ("import_ms", "first_invoke_ms", "warm_invoke_ms"):
+        values = [run[metric] for run in runs]
+        summary[metric] = {"p50": round(percentile(values, 50), 2), "p90": round(percentile(values, 90), 2),
+                           "min": round(min(values), 2), "max": round(max(values), 2)}
+    cold = [run["import_ms"] + run["first_invoke_ms"] for run in runs]
+    summary["cold_start_ms"] = {"p50": round(percentile(cold, 50), 2), "p90": round(percentile(cold, 90), 2),
+                                "min": round(min(cold), 2), "max": round(max(cold), 2)}
+    report = {"python": sys.version.split()[0], "runs": args.runs, "summary": summary,
+              "aws_calls_per_run": {action: round(count / args.runs, 2) for action, count in sorted(calls.items())}}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["summary"]["cold_start_ms"]["p50"]
+        current = summary["cold_start_ms"]["p50"]
+        change = (current - baseline) / baseline
+        print(f"cold_start p50: {current}ms vs. baseline {baseline}ms ({change:+.1%})", file=sys.stderr)
+        if change > args.max_regression:
+            print("Cold-start regression exceeds the allowed threshold", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# terraform/modules/auto-remediation/benchmarks/replay.py
+
+# Replay/throughput benchmark for the remediation Lambda.
+# Feeds recorded or generated AuthorizeSecurityGroupIngress and RunInstances events through
+# lambda_handler in this process, with boto3 pointed at the local EC2 stub (stub_aws_endpoint.py),
+# and reports events/sec, per-event latency percentiles, EC2 API calls and simulated billed duration.
+#
+# Examples (run from this directory):
+#   python replay.py --suite --output replay.json                         # the standard scenarios
+#   python replay.py --kind sg --events 20 --size 500                     # 20 events with 500 permissions each
+#   python replay.py --kind run --events 50 --size 100 --latency-ms 20 --error-rate 0.05 --concurrency 8
+#   python replay.py --events-file recorded_events.jsonl --duplicate-rate 0.1   # EventBridge events or CloudTrail records
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_aws_endpoint import serve
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_function_code")
+APPROVED_AMI_ID = "ami-approved"
+
+# Lambda bills per started millisecond; 128 MB matches memory_size in ../main.tf
+DEFAULT_MEMORY_MB = 128
+
+# kind, events, size (permissions or instances per event), concurrency, latency_ms, error_rate, duplicate_rate
+SUITE = [
+    ("sg-single-permission", "sg", 200, 1, 1, 0, 0.0, 0.0),
+    ("sg-500-permissions", "sg", 20, 500, 1, 0, 0.0, 0.0),
+    ("run-single-instance", "run", 200, 1, 1, 0, 0.0, 0.0),
+    ("run-100-instances", "run", 20, 100, 1, 0, 0.0, 0.0),
+    ("mixed-burst", "mixed", 200, 20, 8, 5, 0.0, 0.0),
+    ("mixed-slow-throttled", "mixed", 100, 20, 8, 20, 0.05, 0.0),
+    ("mixed-redelivered", "mixed", 200, 20, 1, 5, 0.0, 0.25),
+]
+
+SG_PORTS = [22, 22, 80, 443, 3389, 5432, 8080, (0, 1024), (20, 30), None]
+SG_CIDRS = [("0.0.0.0/0", False), ("0.0.0.0/0", False), ("::/0", True), ("10.0.0.0/16", False), ("192.168.1.0/24", False)]
+
+def sg_event(rng, index, permissions):
+    items = []
+    for _ in range(permissions):
+        port = rng.choice(SG_PORTS)
+        cidr, ipv6 = rng.choice(SG_CIDRS)
+        if port is None:
+            perm = {"ipProtocol": "-1"}
+        else:
+            low, high = port if isinstance(port, tuple) else (port, port)
+            perm = {"ipProtocol": "tcp", "fromPort": low, "toPort": high}
+        if ipv6:
+            perm["ipv6Ranges"] = {"items": [{"cidrIpv6": cidr}]}
+        else:
+            perm["ipRanges"] = {"items": [{"cidrIp": cidr}]}
+        items.append(perm)
+    return {
+        "id": f"replay-sg-{index}",
+        "detail-type": "AWS API Call via CloudTrail",
+        "detail": {
+            "eventID": f"replay-sg-{index}",
+            "eventName": "AuthorizeSecurityGroupIngress",
+            "requestParameters": {"groupId": f"sg-{index:017x}", "ipPermissions": {"items": items}},
+            "responseElements": {"_return": True},
+        },
+    }
+
+def run_event(rng, index, instances):
+    # Most launches in the replay use an unapproved AMI, so the remediation path is exercised
+    ami_id = APPROVED_AMI_ID if rng.random() < 0.2 else "ami-unapproved"
+    instance_ids = [f"i-{index:08x}{n:09x}" for n in range(instances)]
+    return {
+        "id": f"replay-run-{index}",
+        "detail-type": "AWS API Call via CloudTrail",
+        "detail": {
+            "eventID": f"replay-run-{index}",
+            "eventName": "RunInstances",
+            "requestParameters": {"instancesSet": {"items": [{"imageId": ami_id, "minCount": instances, "maxCount": instances}]}},
+            "responseElements": {"instancesSet": {"items": [{"instanceId": instance_id, "imageId": ami_id} for instance_id in instance_ids]}},
+        },
+    }
+
+def generate_events(kind, count, size, seed):
+    rng = random.Random(seed)
+    events = []
+    for index in range(count):
+        event_kind = kind if kind != "mixed" else rng.choice(["sg", "run"])
+        events.append(sg_event(rng, index, size) if event_kind == "sg" else run_event(rng, index, size))
+    return events
+
+def add_duplicates(events, rate, seed):
+    """Redelivers a share of the events later in the stream, as EventBridge may."""
+    rng = random.Random(seed)
+    replayed = list(events)
+    for event in events:
+        if rng.random() < rate:
+            replayed.insert(rng.randint(replayed.index(event) + 1, len(replayed)), event)
+    return replayed
+
+def load_events(path):
+    """Reads a JSON list or JSON Lines file of EventBridge events; bare CloudTrail records are wrapped."""
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        events = json.loads(text)
+    elif text.lstrip().startswith('{"Records"'):
+        events = json.loads(text)["Records"]
+    else:
+        events = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [event if "detail" in event else {"id": event.get("eventID"), "detail": event} for event in events]
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def setup_lambda_env():
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "stub")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "stub")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ["APPROVED_AMI_ID"] = APPROVED_AMI_ID
+    os.environ.pop("REMEDIATION_STATE_TABLE", None) # Keep state in memory
+    sys.path.insert(0, LAMBDA_DIR)
+
+def replay(name, events, concurrency, latency_ms, error_rate, initial_state, memory_mb, seed):
+    import aws_clients
+    import idempotency
+    import main as lambda_main
+    import state_store
+
+    # Each scenario starts with empty state, as if on fresh containers
+    state_store.set_state_store(state_store.LocalStateStore())
+    idempotency.set_idempotency_cache(idempotency.IdempotencyCache())
+
+    server, calls = serve(latency_ms=latency_ms, error_rate=error_rate, initial_state=initial_state, seed=seed)
+    os.environ["AWS_ENDPOINT_URL_EC2"] = f"http://127.0.0.1:{server.server_address[1]}"
+    aws_clients.reset_clients() # New clients pick up this scenario's endpoint
+    lambda_main.ec2() # Client creation is a cold-start cost (see cold_start.py), not part of the replay
+
+    def invoke(event):
+        started = time.perf_counter()
+        try:
+            result = lambda_main.lambda_handler(event, None) or {}
+        except lambda_main.RemediationIncomplete:
+            # A failed invocation, which Lambda would retry
+            return time.perf_counter() - started, "retried"
+        return time.perf_counter() - started, "duplicate" if result.get("duplicate") else result.get("status", "none")
+
+    try:
+        # The handler logs every event; keep that out of the measurement's output
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(invoke, events))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    statuses = {}
+    for _, status in outcomes:
+        statuses[status] = statuses.get(status, 0) + 1
+    # Each invocation is billed separately, rounded up to the next millisecond
+    billed_ms = sum(math.ceil(latency * 1000) for latency in latencies)
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        "scenario": name,
+        "events": len(events),
+        "concurrency": concurrency,
+        "stub_latency_ms": latency_ms,
+        "stub_error_rate": error_rate,
+        "duration_s": round(elapsed, 3),
+        "events_per_second": round(len(events) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": to_ms(percentile(latencies, 50)),
+            "p95": to_ms(percentile(latencies, 95)),
+            "p99": to_ms(percentile(latencies, 99)),
+            "max": to_ms(latencies[-1] if latencies else None),
+        },
+        "statuses": statuses,
+        "aws_calls": dict(sorted(calls.items())),
+        "aws_calls_per_event": round(sum(calls.values()) / len(events), 2) if events else None,
+        "injected_errors": dict(sorted(server.errors.items())),
+        "billed": {
+            "memory_mb": memory_mb,
+            "total_ms": billed_ms,
+            "mean_ms": round(billed_ms / len(events), 1) if events else None,
+            "gb_seconds": round(billed_ms / 1000.0 * memory_mb / 1024.0, 4),
+        },
+        "log_bytes": len(log.getvalue()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay CloudTrail events through the remediation Lambda against a stub EC2 API")
+    parser.add_argument("--suite", action="store_true", help="Run the standard scenarios (ignores --kind/--events/--size)")
+    parser.add_argument("--events-file", help="Replay recorded events (JSON list, JSON Lines or a CloudTrail {\"Records\": [...]} file)")
+    parser.add_argument("--kind", choices=["sg", "run", "mixed"], default="mixed", help="Generated event type")
+    parser.add_argument("--events", type=int, default=100, help="Number of generated events")
+    parser.add_argument("--size", type=int, default=10, help="Permissions (sg) or instances (run) per generated event")
+    parser.add_argument("--concurrency", type=int, default=1, help="Events handled at once (like concurrent Lambda invocations)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every stub EC2 API call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub EC2 API calls that are throttled")
+    parser.add_argument("--initial-state", default="pending", help="State of instances the stub hasn't seen yet ('running' exercises the stop-and-wait path)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Share of events delivered a second time")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB, help="Lambda memory size for the billed GB-seconds")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for event generation and error injection")
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    setup_lambda_env()
+    if args.suite:
+        scenarios = [(name, add_duplicates(generate_events(kind, count, size, args.seed), duplicate_rate, args.seed),
+                      concurrency, latency_ms, error_rate)
+                     for name, kind, count, size, concurrency, latency_ms, error_rate, duplicate_rate in SUITE]
+    elif args.events_file:
+        scenarios = [(os.path.basename(args.events_file), add_duplicates(load_events(args.events_file), args.duplicate_rate, args.seed),
+                      args.concurrency, args.latency_ms, args.error_rate)]
+    else:
+        events = generate_events(args.kind, args.events, args.size, args.seed)
+        scenarios = [(f"{args.kind}-{args.events}x{args.size}", add_duplicates(events, args.duplicate_rate, args.seed),
+                      args.concurrency, args.latency_ms, args.error_rate)]
+
+    results = []
+    for name, events, concurrency, latency_ms, error_rate in scenarios:
+        result = replay(name, events, concurrency, latency_ms, error_rate, args.initial_state, args.memory_mb, args.seed)
+        results.append(result)
+        print(f"{name}: {result['events_per_second']} events/s, p50={result['latency_ms']['p50']}ms "
+              f"p99={result['latency_ms']['p99']}ms, {result['aws_calls_per_event']} API calls/event, "
+              f"billed {result['billed']['gb_seconds']} GB-s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "initial_state": args.initial_state,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
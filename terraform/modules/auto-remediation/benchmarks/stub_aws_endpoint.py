@@ -0,0 +1,121 @@
+# terraform/modules/auto-remediation/benchmarks/stub_aws_endpoint.py
+
+# Local HTTP endpoint that answers the EC2 Query API calls the remediation Lambda makes,
+# so the real boto3/botocore stack can be exercised offline. Point boto3 at it with
+# AWS_ENDPOINT_URL_EC2=http://127.0.0.1:<port> (plus dummy credentials).
+# Instances are tracked in memory: unknown IDs start in initial_state, stop makes them 'stopped'
+# and terminate makes them 'terminated'. Every request can be delayed by latency_ms, and a share
+# (error_rate) fails with a throttling error, which botocore retries like the real API.
+
+import fnmatch
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+EC2_XMLNS = "http://ec2.amazonaws.com/doc/2016-11-15/"
+
+def ec2_response(action, body):
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<{action}Response xmlns="{EC2_XMLNS}"><requestId>stub-request</requestId>{body}</{action}Response>')
+
+def instance_ids(params):
+    ids = [values[0] for name, values in params.items() if name.startswith("InstanceId.")]
+    for name, values in params.items():
+        # describe_instances with an instance-id filter: Filter.1.Value.N
+        if name.startswith("Filter.") and ".Value." in name:
+            ids.append(values[0])
+    return ids
+
+def describe_instances(server, params):
+    items = "".join(
+        f"<item><instanceId>{instance_id}</instanceId><instanceState><code>0</code>"
+        f"<name>{server.instances.setdefault(instance_id, server.initial_state)}</name></instanceState></item>"
+        for instance_id in instance_ids(params)
+    )
+    return ec2_response("DescribeInstances", f"<reservationSet><item><reservationId>r-stub</reservationId><instancesSet>{items}</instancesSet></item></reservationSet>")
+
+def instance_state_change(action, new_state, reported_state):
+    def handler(server, params):
+        items = []
+        for instance_id in instance_ids(params):
+            previous_state = server.instances.get(instance_id, server.initial_state)
+            server.instances[instance_id] = new_state
+            items.append(f"<item><instanceId>{instance_id}</instanceId><currentState><code>0</code><name>{reported_state}</name></currentState>"
+                         f"<previousState><code>0</code><name>{previous_state}</name></previousState></item>")
+        return ec2_response(action, f"<instancesSet>{''.join(items)}</instancesSet>")
+    return handler
+
+def describe_images(server, params):
+    # Supports the owner and name filters used by the approved-AMI rules
+    owners = {values[0] for name, values in params.items() if name.startswith("Owner.")}
+    patterns = [values[0] for name, values in params.items() if name.startswith("Filter.") and ".Value." in name]
+    items = "".join(
+        f"<item><imageId>{image_id}</imageId><imageOwnerId>{owner}</imageOwnerId><name>{name}</name></item>"
+        for image_id, owner, name in server.images
+        if (not owners or owner in owners) and all(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+    )
+    return ec2_response("DescribeImages", f"<imagesSet>{items}</imagesSet>")
+
+HANDLERS = {
+    "DescribeInstances": describe_instances,
+    # Stops complete immediately, so the next describe reports the instance stopped
+    "StopInstances": instance_state_change("StopInstances", "stopped", "stopping"),
+    "TerminateInstances": instance_state_change("TerminateInstances", "terminated", "shutting-down"),
+    "RevokeSecurityGroupIngress": lambda server, params: ec2_response("RevokeSecurityGroupIngress", "<return>true</return>"),
+    "DescribeImages": describe_images,
+}
+
+THROTTLE_ERROR = ('<?xml version="1.0" encoding="UTF-8"?>\n<Response><Errors><Error><Code>RequestLimitExceeded</Code>'
+                  '<Message>Request limit exceeded.</Message></Error></Errors><RequestID>stub-request</RequestID></Response>')
+
+class StubEC2Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real endpoint
+    disable_nagle_algorithm = True # Otherwise delayed ACKs add ~40ms to every response
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        params = parse_qs(self.rfile.read(length).decode())
+        action = params.get("Action", [""])[0]
+        if server.latency:
+            time.sleep(server.latency)
+        handler = HANDLERS.get(action)
+        with server.lock:
+            server.calls[action] = server.calls.get(action, 0) + 1
+            throttled = handler is not None and server.random.random() < server.error_rate
+            if throttled:
+                server.errors[action] = server.errors.get(action, 0) + 1
+                status, body = 503, THROTTLE_ERROR
+            elif handler is None:
+                status, body = 400, f"<Response><Errors><Error><Code>InvalidAction</Code><Message>{action}</Message></Error></Errors></Response>"
+            else:
+                status, body = 200, handler(server, params)
+        self.send_response(status)
+        encoded = body.encode()
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port=0, latency_ms=0, error_rate=0.0, initial_state="pending", seed=None, images=()):
+    """
+    Starts the stub in a background thread; returns (server, calls).
+    images is a list of (image_id, owner_id, name) returned by DescribeImages.
+    calls counts every request by action (retries included); server.errors counts the injected failures.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubEC2Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.calls, server.errors, server.instances = {}, {}, {}
+    server.latency = latency_ms / 1000.0
+    server.error_rate = error_rate
+    server.initial_state = initial_state
+    server.images = list(images)
+    server.random = random.Random(seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.calls
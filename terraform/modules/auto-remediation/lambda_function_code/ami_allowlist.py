@@ -0,0 +1,123 @@
+# terraform/modules/auto-remediation/lambda_function_code/ami_allowlist.py
+
+# Approved-AMI allow-list. Combines fixed AMI IDs with rules that are resolved to AMI IDs
+# through describe_images, so new builds of a golden image family are approved without
+# redeploying the Lambda. The resolved set is cached per container and refreshed after
+# APPROVED_AMI_CACHE_TTL seconds, so checking an AMI is a set lookup on warm invocations.
+#
+# APPROVED_AMI_ID     single approved AMI ID (kept for existing deployments)
+# APPROVED_AMI_IDS    comma-separated approved AMI IDs
+# APPROVED_AMI_RULES  JSON list of rules, each with owner account IDs or aliases and optionally a name pattern, e.g.
+#                     [{"owners": ["amazon"], "name": "amzn2-ami-ecs-hvm-*-x86_64-ebs"},
+#                      {"owners": ["123456789012"], "regions": ["us-east-1", "eu-west-1"]}]
+#                     "owners" is required: without it describe_images matches public AMIs from any account.
+#                     "regions" defaults to the Lambda's own region.
+
+import json
+import os
+import threading
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+import log
+from aws_clients import get_client
+
+APPROVED_AMI_CACHE_TTL = float(os.environ.get('APPROVED_AMI_CACHE_TTL', 300))
+REFRESH_RETRY_SECONDS = 30 # After a failed refresh, keep using the last set and retry this much later
+
+def parse_ids(value):
+    return {ami_id.strip() for ami_id in (value or '').split(',') if ami_id.strip()}
+
+def validate_rules(rules):
+    """Raises ValueError unless every rule is restricted to explicit owners."""
+    if not isinstance(rules, list):
+        raise ValueError("APPROVED_AMI_RULES must be a JSON list of rules")
+    for index, rule in enumerate(rules):
+        owners = rule.get('owners') if isinstance(rule, dict) else None
+        if not isinstance(owners, list) or not owners or not all(isinstance(owner, str) and owner for owner in owners):
+            raise ValueError(f"APPROVED_AMI_RULES rule {index} must list its owners (account IDs or aliases such as 'self' or 'amazon')")
+    return rules
+
+class AmiAllowList:
+    """Fixed AMI IDs plus describe_images rules, resolved lazily and cached with a TTL."""
+
+    def __init__(self, ami_ids=(), rules=(), ttl=APPROVED_AMI_CACHE_TTL):
+        self.ami_ids = frozenset(ami_ids)
+        self.rules = list(rules)
+        self.ttl = ttl
+        self._resolved = frozenset()
+        self._expires_at = 0 # Monotonic time of the next refresh
+        self._loaded = False # Whether the rules have been resolved successfully at least once
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        ami_ids = parse_ids(os.environ.get('APPROVED_AMI_IDS')) | parse_ids(os.environ.get('APPROVED_AMI_ID'))
+        rules = validate_rules(json.loads(os.environ.get('APPROVED_AMI_RULES') or '[]'))
+        return cls(ami_ids, rules)
+
+    @property
+    def configured(self):
+        return bool(self.ami_ids or self.rules)
+
+    @property
+    def rules_resolved(self):
+        """False while rules are configured but have never resolved, i.e. the rule-approved AMIs are unknown."""
+        return not self.rules or self._loaded
+
+    def resolve_rule(self, rule):
+        """AMI IDs matching one rule, across its regions."""
+        params = {'Owners': list(rule['owners'])} # Never unrestricted: that would approve every public AMI
+        if rule.get('name'):
+            params['Filters'] = [{'Name': 'name', 'Values': [rule['name']]}]
+        ami_ids = set()
+        for region in rule.get('regions') or [None]:
+            paginator = get_client('ec2', region).get_paginator('describe_images')
+            for page in paginator.paginate(**params):
+                ami_ids.update(image['ImageId'] for image in page['Images'])
+        return ami_ids
+
+    def resolved_ids(self):
+        """The AMI IDs resolved from the rules, refreshed when the cached set has expired."""
+        if not self.rules or time.monotonic() < self._expires_at:
+            return self._resolved
+        # One thread refreshes; the others keep using the current set meanwhile
+        if not self._refresh_lock.acquire(blocking=not self._resolved):
+            return self._resolved
+        try:
+            if time.monotonic() < self._expires_at:
+                return self._resolved
+            started = time.perf_counter()
+            try:
+                resolved = set()
+                for rule in self.rules:
+                    resolved |= self.resolve_rule(rule)
+            except (ClientError, BotoCoreError) as e:
+                log.warning("Error resolving approved AMI rules, keeping %d cached AMI(s): %s", len(self._resolved), e)
+                self._expires_at = time.monotonic() + REFRESH_RETRY_SECONDS
+                return self._resolved
+            self._resolved = frozenset(resolved)
+            self._loaded = True
+            self._expires_at = time.monotonic() + self.ttl
+            log.info("Resolved %d approved AMI(s) from %d rule(s)", len(resolved), len(self.rules),
+                     duration_ms=round((time.perf_counter() - started) * 1000, 1))
+            return self._resolved
+        finally:
+            self._refresh_lock.release()
+
+    def is_approved(self, ami_id):
+        return ami_id in self.ami_ids or ami_id in self.resolved_ids()
+
+_allowlist = None
+
+def get_ami_allowlist():
+    global _allowlist
+    if _allowlist is None:
+        _allowlist = AmiAllowList.from_environment()
+    return _allowlist
+
+def set_ami_allowlist(allowlist):
+    """Replaces the allow-list, e.g. in tests and benchmarks."""
+    global _allowlist
+    _allowlist = allowlist
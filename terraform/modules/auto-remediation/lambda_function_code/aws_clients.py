@@ -0,0 +1,51 @@
+# terraform/modules/auto-remediation/lambda_function_code/aws_clients.py
+
+import os
+import threading
+
+# boto3 is imported on first use rather than at module import, and clients are created lazily and
+# cached per (service, region) for the life of the container, so a cold start only pays for the
+# clients the event actually needs.
+
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 3))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', 2))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', 10))
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 10))
+
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+def _default_region():
+    return os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
+
+def get_client(service, region=None):
+    """Returns the cached boto3 client for service/region, creating it on first use."""
+    global _session
+    key = (service, region or _default_region())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            if _session is None:
+                # One session shares its loaded service models between clients
+                _session = boto3.session.Session()
+            client = _session.client(service, region_name=key[1], config=Config(
+                retries={'max_attempts': AWS_MAX_ATTEMPTS, 'mode': 'standard'},
+                connect_timeout=AWS_CONNECT_TIMEOUT,
+                read_timeout=AWS_READ_TIMEOUT,
+                max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+            ))
+            _clients[key] = client
+    return client
+
+def set_client(service, client, region=None):
+    """Installs a client (e.g. a stub) for service/region, used by tests and benchmarks."""
+    _clients[(service, region or _default_region())] = client
+
+def reset_clients():
+    _clients.clear()
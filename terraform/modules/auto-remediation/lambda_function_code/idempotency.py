@@ -0,0 +1,95 @@
+# terraform/modules/auto-remediation/lambda_function_code/idempotency.py
+
+# Dedupe for repeated deliveries of the same event (EventBridge is at-least-once, and Lambda retries
+# invocations that fail). Outcomes are keyed on the event ID plus the resources it targets and
+# kept for IDEMPOTENCY_TTL seconds: first in a per-container LRU, so a duplicate that lands on a
+# warm container returns in microseconds, and then in the shared state store (DynamoDB, or the
+# local stand-in), so a duplicate on another container still skips the API calls.
+#
+# Only final, fully successful outcomes are recorded. Partial and deferred results fail the invocation
+# (see lambda_handler), so Lambda's retry runs them again instead of finding a recorded outcome.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+import log
+from state_store import get_state_store
+
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 1024))
+FINAL_STATUSES = ('success', 'approved')
+
+def idempotency_key(event_id, resource_ids):
+    """Key for an event and the resources it targets; the resource list is hashed to keep keys short."""
+    resources = hashlib.sha256(",".join(sorted(resource_ids)).encode()).hexdigest()[:16]
+    return f"idempotency#{event_id}#{resources}"
+
+class IdempotencyCache:
+    """Per-container LRU of recent outcomes in front of the shared state store."""
+
+    def __init__(self, store=None, ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_CACHE_SIZE):
+        self.store = store
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (expires_at, outcome), least recently used first
+
+    def _shared(self):
+        return self.store or get_state_store()
+
+    def _remember(self, key, outcome, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, outcome)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Returns the recorded outcome for key, or None if the event hasn't been handled yet."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, outcome = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    return outcome
+                del self._entries[key]
+        try:
+            outcome = self._shared().get(key)
+        except (ClientError, BotoCoreError) as e:
+            # Without the shared record the event is simply handled again
+            log.warning("Error reading idempotency record %s: %s", key, e)
+            return None
+        if outcome is not None:
+            self._remember(key, outcome, time.time() + self.ttl)
+        return outcome
+
+    def put(self, key, outcome):
+        """Records a final outcome; failed, partial, deferred and skipped outcomes are not recorded so retries can run."""
+        if not isinstance(outcome, dict) or outcome.get('status') not in FINAL_STATUSES:
+            return
+        if any('error' in item or item.get('action') == 'not_found' for item in (outcome.get('outcomes') or {}).values()):
+            return # Some resources failed or weren't visible yet, so the event isn't done
+        self._remember(key, outcome, time.time() + self.ttl)
+        try:
+            self._shared().put(key, outcome, self.ttl)
+        except (ClientError, BotoCoreError) as e:
+            log.warning("Error writing idempotency record %s: %s", key, e)
+
+_cache = None
+
+def get_idempotency_cache():
+    global _cache
+    if _cache is None:
+        _cache = IdempotencyCache()
+    return _cache
+
+def set_idempotency_cache(cache):
+    """Replaces the cache, e.g. with one on a LocalStateStore in tests and benchmarks."""
+    global _cache
+    _cache = cache
@@ -0,0 +1,68 @@
+# terraform/modules/auto-remediation/lambda_function_code/log.py
+
+# Structured logging for the Lambda: one compact JSON line per log call, tagged with the
+# CloudTrail eventID as correlation_id so every line of an invocation can be found together.
+# Levels are checked before anything is formatted: %-style args are only interpolated, and
+# callable field values (e.g. payload=lambda: event) only evaluated, when the line is written.
+# Full event dumps are DEBUG-only, or written for a sampled share of invocations.
+#
+# LOG_LEVEL              DEBUG, INFO (default), WARNING or ERROR
+# LOG_DEBUG_SAMPLE_RATE  share of invocations that also write debug dumps at INFO (default 0)
+
+import json
+import os
+import random
+import threading
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+LOG_LEVEL = LEVELS.get(os.environ.get('LOG_LEVEL', 'INFO').upper(), LEVELS['INFO'])
+DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0))
+
+# Per thread, so concurrent replays in one process don't mix up their correlation IDs
+_invocation = threading.local()
+
+def start_invocation(event, context=None):
+    """Sets the correlation fields for this invocation and decides whether it is sampled for debug dumps."""
+    detail = event.get('detail') or {}
+    _invocation.fields = {
+        'correlation_id': detail.get('eventID') or event.get('id'),
+        'request_id': getattr(context, 'aws_request_id', None),
+    }
+    _invocation.sampled = DEBUG_SAMPLE_RATE > 0 and random.random() < DEBUG_SAMPLE_RATE
+
+def enabled(level):
+    return LEVELS[level] >= LOG_LEVEL
+
+def _write(level, message, args, fields):
+    record = {'level': level, 'message': message % args if args else message}
+    record.update(getattr(_invocation, 'fields', {}))
+    for name, value in fields.items():
+        record[name] = value() if callable(value) else value
+    print(json.dumps(record, separators=(',', ':'), default=str))
+
+def debug(message, *args, **fields):
+    if LEVELS['DEBUG'] >= LOG_LEVEL:
+        _write('DEBUG', message, args, fields)
+
+def info(message, *args, **fields):
+    if LEVELS['INFO'] >= LOG_LEVEL:
+        _write('INFO', message, args, fields)
+
+def warning(message, *args, **fields):
+    if LEVELS['WARNING'] >= LOG_LEVEL:
+        _write('WARNING', message, args, fields)
+
+def error(message, *args, **fields):
+    if LEVELS['ERROR'] >= LOG_LEVEL:
+        _write('ERROR', message, args, fields)
+
+def decision(action, message, *args, **fields):
+    """The one INFO line that records what the Lambda decided to do for an event (or part of it)."""
+    info(message, *args, decision=action, **fields)
+
+def debug_dump(message, payload):
+    """Writes a full payload (e.g. the event) at DEBUG, or at INFO for sampled invocations."""
+    if enabled('DEBUG'):
+        _write('DEBUG', message, (), {'payload': payload})
+    elif getattr(_invocation, 'sampled', False):
+        _write('INFO', message, (), {'payload': payload, 'sampled': True})
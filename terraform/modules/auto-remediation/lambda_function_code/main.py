@@ -1,249 +1,260 @@
 # terraform/modules/auto-remediation/lambda_function_code/main.py
 
-import json
 import os
-import boto3
 import time
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
 
-ec2_client = boto3.client('ec2')
-s3_client = boto3.client('s3') # For potential future S3 remediation
-iam_client = boto3.client('iam') # For potential future IAM key remediation
+import log
+from ami_allowlist import get_ami_allowlist
+from aws_clients import get_client
+from idempotency import get_idempotency_cache, idempotency_key
+from sg_rules import build_revoke_permissions, describe_rule, find_violations, matching_rule_ids
+from state_store import get_state_store
 
-def revoke_ssh_0_0_0_0_sg_rule(event):
+# Results that leave work to do: the invocation fails so Lambda retries the event
+RETRY_STATUSES = ('partial', 'deferred')
+
+class RemediationIncomplete(Exception):
     """
-    Remediates Security Group ingress rules allowing SSH from 0.0.0.0/0.
-    Triggered by CloudTrail event 'AuthorizeSecurityGroupIngress'.
+    Raised when an event could not be remediated and should be handled again.
+    lambda_handler lets it fail the invocation, so Lambda's asynchronous retries (and after them
+    the on-failure destination in ../main.tf) take the event over.
     """
-    print(f"Received event for SSH remediation: {json.dumps(event, indent=2)}")
 
+def ec2():
+    """EC2 client, created on first use so cold starts don't pay for it up front."""
+    return get_client('ec2')
+
+def revoke_world_open_sg_rules(event):
+    """
+    Remediates Security Group ingress rules that open sensitive ports to the world (SG_POLICIES,
+    by default SSH from 0.0.0.0/0 or ::/0, including port ranges and all-traffic rules).
+    All violating rules in the event are revoked with a single API call, or with one call per rule
+    if the batch fails because one of them is already gone.
+    Triggered by CloudTrail event 'AuthorizeSecurityGroupIngress'.
+    """
     try:
         detail = event['detail']
         request_parameters = detail['requestParameters']
-        response_elements = detail['responseElements']
+        response_elements = detail.get('responseElements') or {}
 
-        if 'securityGroupId' not in request_parameters and 'groupId' not in request_parameters:
-            print("No security group ID found in event. Skipping.")
-            return
-        
         security_group_id = request_parameters.get('securityGroupId') or request_parameters.get('groupId')
+        if not security_group_id:
+            log.decision("skip", "No security group ID found in event. Skipping.")
+            return
 
-        # Handle ipPermissions structure - it can be a dict with 'items' or a list
-        ip_permissions_raw = request_parameters.get('ipPermissions', [])
-        if isinstance(ip_permissions_raw, dict):
-            ip_permissions = ip_permissions_raw.get('items', [])
-        else:
-            ip_permissions = ip_permissions_raw
-            
+        ip_permissions = request_parameters.get('ipPermissions')
         if not ip_permissions:
-            print("No IP permissions found in event. Skipping.")
+            log.decision("skip", "No IP permissions found in event. Skipping.", security_group_id=security_group_id)
             return
-        
-        revoked_rules = []
-
-        for perm in ip_permissions:
-            # Debug: Print the permission structure
-            print(f"Processing permission: {json.dumps(perm, indent=2)}")
-            
-            # Ensure perm is a dictionary before proceeding
-            if not isinstance(perm, dict):
-                print(f"Permission is not a dict: {type(perm)}, value: {perm}")
-                continue
-            
-            # Get IP ranges - handle different possible structures
-            ip_ranges = []
-            ip_ranges_raw = perm.get("ipRanges", [])
-            
-            print(f"ip_ranges_raw type: {type(ip_ranges_raw)}, value: {ip_ranges_raw}")
-            
-            if isinstance(ip_ranges_raw, dict):
-                # Handle case where ipRanges is a dict with 'items' key (CloudTrail format)
-                items = ip_ranges_raw.get("items", [])
-                if isinstance(items, list):
-                    ip_ranges = items
-                elif isinstance(items, dict):
-                    ip_ranges = [items]
-                else:
-                    print(f"Unexpected items type: {type(items)}, value: {items}")
-                    ip_ranges = []
-            elif isinstance(ip_ranges_raw, list):
-                ip_ranges = ip_ranges_raw
-            else:
-                print(f"Unexpected ip_ranges_raw type: {type(ip_ranges_raw)}")
-                ip_ranges = []
-                
-            print(f"Final ip_ranges: {ip_ranges}")
-                
-            # Check for SSH (port 22) and 0.0.0.0/0 CIDR
-            if perm.get('fromPort') == 22 and perm.get('toPort') == 22 and perm.get('ipProtocol') == 'tcp':
-                for ip_range in ip_ranges:
-                    print(f"Processing ip_range: {type(ip_range)}, value: {ip_range}")
-                    
-                    # Handle different ip_range formats
-                    cidr_ip = None
-                    if isinstance(ip_range, dict):
-                        cidr_ip = ip_range.get('cidrIp')
-                    elif isinstance(ip_range, str):
-                        # Sometimes the CIDR might be directly as a string
-                        cidr_ip = ip_range
-                    else:
-                        print(f"Unexpected ip_range type: {type(ip_range)}, value: {ip_range}")
-                        continue
-                    
-                    if cidr_ip == '0.0.0.0/0':
-                        print(f"Found SSH 0.0.0.0/0 rule in SG {security_group_id}. Attempting to revoke...")
-                        try:
-                            # Try to revoke using the exact permission structure
-                            revoke_permission = {
-                                'IpProtocol': perm.get('ipProtocol'),
-                                'FromPort': perm.get('fromPort'),
-                                'ToPort': perm.get('toPort'),
-                                'IpRanges': [{'CidrIp': '0.0.0.0/0'}]
-                            }
-                            
-                            # Add description if it exists
-                            if isinstance(ip_range, dict) and ip_range.get('description'):
-                                revoke_permission['IpRanges'][0]['Description'] = ip_range.get('description')
-                            
-                            print(f"Revoking with permission: {json.dumps(revoke_permission, indent=2)}")
-                            
-                            ec2_client.revoke_security_group_ingress(
-                                GroupId=security_group_id,
-                                IpPermissions=[revoke_permission]
-                            )
-                            revoked_rules.append(f"Revoked SSH 0.0.0.0/0 from {security_group_id}")
-                            print(f"Successfully revoked SSH 0.0.0.0/0 from {security_group_id}")
-                            
-                        except ClientError as e:
-                            if e.response['Error']['Code'] == 'InvalidPermission.NotFound':
-                                print(f"Rule already removed or not found: {e}")
-                            else:
-                                print(f"Error revoking rule for {security_group_id}: {e}")
-                                
-                                # Try alternative approach using rule ID if available
-                                if 'securityGroupRuleSet' in response_elements:
-                                    rule_set = response_elements['securityGroupRuleSet']
-                                    if isinstance(rule_set, dict) and 'items' in rule_set:
-                                        for rule_item in rule_set['items']:
-                                            if (isinstance(rule_item, dict) and 
-                                                rule_item.get('fromPort') == 22 and 
-                                                rule_item.get('toPort') == 22 and
-                                                rule_item.get('cidrIpv4') == '0.0.0.0/0'):
-                                                
-                                                rule_id = rule_item.get('securityGroupRuleId')
-                                                if rule_id:
-                                                    try:
-                                                        print(f"Attempting to revoke using rule ID: {rule_id}")
-                                                        ec2_client.revoke_security_group_ingress(
-                                                            GroupId=security_group_id,
-                                                            SecurityGroupRuleIds=[rule_id]
-                                                        )
-                                                        revoked_rules.append(f"Revoked SSH 0.0.0.0/0 from {security_group_id} using rule ID")
-                                                        print(f"Successfully revoked using rule ID: {rule_id}")
-                                                        break
-                                                    except ClientError as rule_e:
-                                                        print(f"Error revoking with rule ID {rule_id}: {rule_e}")
-                                else:
-                                    print(f"Could not revoke rule: {e}")
-                                    raise
-                        except Exception as e:
-                            print(f"Unexpected error during revocation: {e}")
-                            raise
-                            
-            # Also check for ALL TCP or ALL protocols from 0.0.0.0/0 on port 22
-            elif (perm.get('fromPort') == 22 and perm.get('toPort') == 22 and perm.get('ipProtocol') in ['tcp', '-1']):
-                for ip_range in ip_ranges:
-                    print(f"Processing broader rule ip_range: {type(ip_range)}, value: {ip_range}")
-                    
-                    # Handle different ip_range formats
-                    cidr_ip = None
-                    if isinstance(ip_range, dict):
-                        cidr_ip = ip_range.get('cidrIp')
-                    elif isinstance(ip_range, str):
-                        cidr_ip = ip_range
-                    else:
-                        print(f"Unexpected ip_range type: {type(ip_range)}, value: {ip_range}")
-                        continue
-                    
-                    if cidr_ip == '0.0.0.0/0':
-                        print(f"Found broader rule (e.g., ALL TCP or ALL) for port 22 0.0.0.0/0 in SG {security_group_id}. Attempting to revoke...")
-                        try:
-                            # Try to revoke using the exact permission structure
-                            revoke_permission = {
-                                'IpProtocol': perm.get('ipProtocol'),
-                                'FromPort': perm.get('fromPort'),
-                                'ToPort': perm.get('toPort'),
-                                'IpRanges': [{'CidrIp': '0.0.0.0/0'}]
-                            }
-                            
-                            # Add description if it exists
-                            if isinstance(ip_range, dict) and ip_range.get('description'):
-                                revoke_permission['IpRanges'][0]['Description'] = ip_range.get('description')
-                            
-                            ec2_client.revoke_security_group_ingress(
-                                GroupId=security_group_id,
-                                IpPermissions=[revoke_permission]
-                            )
-                            revoked_rules.append(f"Revoked broader port 22 0.0.0.0/0 rule from {security_group_id}")
-                            print(f"Successfully revoked broader port 22 0.0.0.0/0 rule from {security_group_id}")
-                            
-                        except ClientError as e:
-                            if e.response['Error']['Code'] == 'InvalidPermission.NotFound':
-                                print(f"Rule already removed or not found: {e}")
-                            else:
-                                print(f"Error revoking broader rule for {security_group_id}: {e}")
-                                raise
-                        except Exception as e:
-                            print(f"Unexpected error during broader rule revocation: {e}")
-                            raise
-
-        if not revoked_rules:
-            print(f"No problematic SSH 0.0.0.0/0 rules found in event for SG {security_group_id}.")
+
+        violations = find_violations(ip_permissions)
+        if not violations:
+            log.decision("none", "No rules violating security group policies found in event for SG %s.", security_group_id,
+                         security_group_id=security_group_id)
+            return {"status": "success", "revoked_rules": []}
+
+        revoked_rules = [f"Revoked {describe_rule(rule)} on {security_group_id} ({', '.join(policies)})"
+                         for _, rule, policies in violations]
+        revoke_permissions = build_revoke_permissions(violations)
+        log.debug("Revoking %d rule(s) from SG %s", len(violations), security_group_id, ip_permissions=revoke_permissions)
+        try:
+            response = ec2().revoke_security_group_ingress(GroupId=security_group_id, IpPermissions=revoke_permissions)
+            # Rules that were already gone are reported back instead of failing the whole call
+            if response.get('UnknownIpPermissions'):
+                log.info("Rules already removed or not found", unknown_ip_permissions=response['UnknownIpPermissions'])
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'InvalidPermission.NotFound':
+                # The batch fails as a whole if any one rule is already gone, so none of the others were revoked
+                log.info("A rule in the batch was not found; revoking rules one at a time: %s", e, security_group_id=security_group_id)
+                revoked_rules = revoke_rules_individually(security_group_id, violations)
+                log.decision("revoke_sg_rules", "Revoked %d rule(s) from SG %s", len(revoked_rules), security_group_id,
+                             security_group_id=security_group_id, revoked_rules=revoked_rules)
+                return {"status": "success", "revoked_rules": revoked_rules}
+            log.warning("Error revoking rules for %s: %s", security_group_id, e)
+
+            # Try alternative approach using the rule IDs returned with the event
+            rule_ids = matching_rule_ids(response_elements.get('securityGroupRuleSet'))
+            if not rule_ids:
+                log.error("Could not revoke rules: %s", e, security_group_id=security_group_id)
+                raise
+            log.info("Attempting to revoke using rule IDs", rule_ids=rule_ids)
+            ec2().revoke_security_group_ingress(GroupId=security_group_id, SecurityGroupRuleIds=rule_ids)
+            revoked_rules = [f"Revoked rule {rule_id} on {security_group_id} using rule ID" for rule_id in rule_ids]
+
+        log.decision("revoke_sg_rules", "Revoked %d rule(s) from SG %s", len(revoked_rules), security_group_id,
+                     security_group_id=security_group_id, revoked_rules=revoked_rules)
         return {"status": "success", "revoked_rules": revoked_rules}
-        
+
     except Exception as e:
-        print(f"An error occurred during SSH remediation: {e}")
+        log.error("An error occurred during security group remediation: %s", e)
         return {"status": "failed", "error": str(e)}
 
-def wait_for_instance_state(instance_id, target_state, max_wait_time=300):
+def revoke_rules_individually(security_group_id, violations):
     """
-    Wait for an instance to reach a specific state.
-    Returns True if target state is reached, False if timeout.
+    Revokes each violating rule with its own call, skipping rules that are already gone.
+    Returns the descriptions of the revoked rules; raises the first other error after trying every rule.
     """
-    start_time = time.time()
-    while time.time() - start_time < max_wait_time:
+    revoked_rules, first_error = [], None
+    for violation in violations:
+        _, rule, policies = violation
         try:
-            response = ec2_client.describe_instances(InstanceIds=[instance_id])
-            if response['Reservations']:
-                current_state = response['Reservations'][0]['Instances'][0]['State']['Name']
-                print(f"Instance {instance_id} current state: {current_state}")
-                
-                if current_state == target_state:
-                    return True
-                elif current_state in ['terminated', 'terminating']:
-                    print(f"Instance {instance_id} is already terminated/terminating")
-                    return False
-                    
-            time.sleep(10)  # Wait 10 seconds before checking again
-            
+            ec2().revoke_security_group_ingress(GroupId=security_group_id, IpPermissions=build_revoke_permissions([violation]))
         except ClientError as e:
-            print(f"Error checking instance {instance_id} state: {e}")
-            return False
-            
-    return False
-    
-def stop_and_terminate_unapproved_ami_instance(event):
+            if e.response['Error']['Code'] == 'InvalidPermission.NotFound':
+                log.info("Rule already removed or not found: %s", describe_rule(rule), security_group_id=security_group_id)
+                continue
+            log.warning("Error revoking %s on %s: %s", describe_rule(rule), security_group_id, e)
+            first_error = first_error or e
+            continue
+        revoked_rules.append(f"Revoked {describe_rule(rule)} on {security_group_id} ({', '.join(policies)})")
+    if first_error is not None:
+        raise first_error
+    return revoked_rules
+
+# Inline waits are short: instances that haven't stopped by then are recorded as pending work
+# and terminated when their EC2 'stopped' state-change event invokes the Lambda again.
+# Waits always leave SAFETY_MARGIN_SECONDS of Lambda time for the terminate call.
+INLINE_WAIT_SECONDS = float(os.environ.get('INLINE_WAIT_SECONDS', 20))
+SAFETY_MARGIN_SECONDS = 10
+INITIAL_POLL_DELAY = 1 # Seconds; doubles after each poll
+MAX_POLL_DELAY = 8
+PENDING_TERMINATION_TTL = 3600 # Seconds a pending termination is kept while waiting for its event
+DESCRIBE_FILTER_LIMIT = 200 # Max values in a single describe_instances filter
+
+def remediation_deadline(context=None, max_wait_time=INLINE_WAIT_SECONDS):
+    """
+    Returns the monotonic time by which waiting must stop.
+    Bounded by max_wait_time and by the Lambda's remaining execution time.
+    """
+    wait_time = max_wait_time
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        remaining = context.get_remaining_time_in_millis() / 1000.0 - SAFETY_MARGIN_SECONDS
+        wait_time = max(0, min(wait_time, remaining))
+    return time.monotonic() + wait_time
+
+def describe_instance_states(instance_ids):
+    """
+    Returns {instance_id: state_name} for all instances, using one describe_instances call per 200 IDs.
+    An instance-id filter is used instead of InstanceIds so one unknown ID doesn't fail the whole call;
+    instances that no longer exist are simply missing from the result.
+    """
+    states = {}
+    paginator = ec2().get_paginator('describe_instances')
+    for i in range(0, len(instance_ids), DESCRIBE_FILTER_LIMIT):
+        chunk = instance_ids[i:i + DESCRIBE_FILTER_LIMIT]
+        for page in paginator.paginate(Filters=[{'Name': 'instance-id', 'Values': chunk}]):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    states[instance['InstanceId']] = instance['State']['Name']
+    return states
+
+def batch_instance_action(action, instance_ids):
+    """
+    Calls an EC2 instance action ('stop_instances' or 'terminate_instances') for all instances at once.
+    If the batch call fails, retries instance by instance so one bad ID doesn't block the rest.
+    Returns (succeeded_ids, {instance_id: error}).
+    """
+    if not instance_ids:
+        return [], {}
+    call = getattr(ec2(), action)
+    try:
+        call(InstanceIds=list(instance_ids))
+        return list(instance_ids), {}
+    except ClientError as e:
+        if len(instance_ids) == 1:
+            return [], {instance_ids[0]: str(e)}
+        log.warning("Batch %s failed for %d instances (%s). Retrying individually...", action, len(instance_ids), e)
+
+    succeeded, errors = [], {}
+    for instance_id in instance_ids:
+        try:
+            call(InstanceIds=[instance_id])
+            succeeded.append(instance_id)
+        except ClientError as e:
+            errors[instance_id] = str(e)
+    return succeeded, errors
+
+def wait_for_instances_state(instance_ids, target_state, deadline, initial_delay=INITIAL_POLL_DELAY, max_delay=MAX_POLL_DELAY):
+    """
+    Wait for a set of instances to reach a specific state, with one shared deadline.
+    Each poll is a single describe_instances call for every instance still pending,
+    with exponential backoff between polls (1s, 2s, 4s, ... up to max_delay).
+    Returns (reached_ids, gone_ids, timed_out_ids); gone means terminated, terminating or not found.
+    """
+    pending = set(instance_ids)
+    reached, gone = set(), set()
+    delay = initial_delay
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # A stop takes a few seconds at least, so sleep before the first poll too
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+        try:
+            states = describe_instance_states(sorted(pending))
+        except ClientError as e:
+            log.warning("Error checking state of instances: %s", e, instance_ids=sorted(pending))
+            break
+        for instance_id in list(pending):
+            current_state = states.get(instance_id)
+            if current_state == target_state:
+                reached.add(instance_id)
+            elif current_state in (None, 'terminated', 'terminating'):
+                gone.add(instance_id)
+            else:
+                continue
+            pending.discard(instance_id)
+        log.debug("Waiting for %s: %d reached, %d gone, %d pending", target_state, len(reached), len(gone), len(pending))
+
+    return sorted(reached), sorted(gone), sorted(pending)
+
+def pending_termination_key(instance_id):
+    return f"pending-terminate#{instance_id}"
+
+def record_pending_terminations(instance_ids, instance_amis, event_id=None):
+    """
+    Records instances that are about to be stopped, so the 'stopped' state-change event can finish them
+    if the inline wait doesn't. Written before stop_instances, so the event always finds the record.
+    instance_amis maps each instance to the unapproved AMI it was launched from.
+    Returns the IDs that could not be recorded (the caller terminates those right away instead).
+    """
+    store = get_state_store()
+    failed = []
+    for instance_id in instance_ids:
+        try:
+            store.put(pending_termination_key(instance_id),
+                      {"ami_id": instance_amis.get(instance_id), "event_id": event_id, "requested_at": time.time()},
+                      PENDING_TERMINATION_TTL)
+        except (ClientError, BotoCoreError) as e:
+            log.warning("Error recording pending termination for %s: %s", instance_id, e)
+            failed.append(instance_id)
+    return failed
+
+def clear_pending_terminations(instance_ids):
+    """Removes the records of instances the inline path has finished with."""
+    store = get_state_store()
+    for instance_id in instance_ids:
+        try:
+            store.delete(pending_termination_key(instance_id))
+        except (ClientError, BotoCoreError) as e:
+            # The record expires on its own; a late 'stopped' event then finds the instance already terminated
+            log.warning("Error clearing pending termination for %s: %s", instance_id, e)
+
+def stop_and_terminate_unapproved_ami_instance(event, context=None):
     """
     Remediates EC2 instances launched with an unapproved AMI.
-    First stops the instance, then terminates it.
+    Each instance is checked against its own AMI (RunInstances can launch from several), and the
+    unapproved ones are stopped, then terminated.
+    All instances in the event are handled together: one describe, one stop and one terminate call,
+    and a single shared wait, so the run time doesn't grow with the number of instances.
     Triggered by CloudTrail event 'RunInstances'.
     """
-    print(f"Received event for unapproved AMI remediation: {json.dumps(event, indent=2)}")
-
-    # Define your list of approved AMI IDs
-    approved_ami_ids = [os.environ.get('APPROVED_AMI_ID')]                     
-    if not approved_ami_ids or approved_ami_ids == ['']:
-        print("APPROVED_AMI_ID environment variable not set. Remediation cannot proceed.")
+    allowlist = get_ami_allowlist()
+    if not allowlist.configured:
+        log.error("No approved AMIs configured (APPROVED_AMI_ID, APPROVED_AMI_IDS or APPROVED_AMI_RULES). Remediation cannot proceed.")
         return {"status": "failed", "message": "Approved AMI ID not configured."}
     
     try:
@@ -263,131 +274,271 @@ def stop_and_terminate_unapproved_ami_instance(event):
             if 'items' in instances_set and len(instances_set['items']) > 0:
                 first_instance = instances_set['items'][0]
                 ami_id = first_instance.get('imageId')
-        
-        if not ami_id:
-            print("No AMI ID found in requestParameters. Checking available keys...")
-            print(f"Available keys in requestParameters: {list(request_parameters.keys())}")
-            return {"status": "skipped", "message": "No AMI ID found in event"}
-
-        print(f"AMI ID from request: {ami_id}")
-        print(f"Approved AMI IDs: {approved_ami_ids}")
-
-        # Check if AMI is approved
-        if ami_id in approved_ami_ids:
-            print(f"AMI {ami_id} is approved. No action needed.")
-            return {"status": "approved", "ami_id": ami_id}
-
-        print(f"AMI {ami_id} is NOT approved. Proceeding with remediation.")
 
-        # Get instances from response
-        if 'instancesSet' not in response_elements or 'items' not in response_elements['instancesSet']:
-            print("No instances found in event. Skipping.")
-            return {"status": "skipped", "message": "No instances found in event"}
-        
-        instances = response_elements['instancesSet']['items']
-        remediated_instances = []
-
-        for instance in instances:
+        # Each launched instance reports its own AMI; the request's AMI is the fallback
+        instance_amis = {}
+        instances_set = response_elements.get('instancesSet') or {}
+        for instance in instances_set.get('items', []) if isinstance(instances_set, dict) else []:
             # Ensure instance is a dictionary before proceeding
             if not isinstance(instance, dict):
-                print(f"Instance is not a dict: {type(instance)}, value: {instance}")
+                log.warning("Skipping unexpected instance data", instance=instance)
                 continue
-                
             instance_id = instance.get('instanceId')
             if not instance_id:
-                print("No instance ID found in instance data")
+                log.warning("No instance ID found in instance data")
                 continue
+            instance_amis.setdefault(instance_id, instance.get('imageId') or ami_id)
+
+        if not ami_id and not any(instance_amis.values()):
+            log.decision("skip", "No AMI ID found in requestParameters", request_parameter_keys=lambda: list(request_parameters.keys()))
+            return {"status": "skipped", "message": "No AMI ID found in event"}
+
+        if not instance_amis:
+            if allowlist.is_approved(ami_id):
+                log.decision("none", "AMI %s is approved. No action needed.", ami_id, ami_id=ami_id)
+                return {"status": "approved", "ami_id": ami_id}
+            log.decision("skip", "No instances found in event. Skipping.", ami_id=ami_id)
+            return {"status": "skipped", "message": "No instances found in event"}
 
-            print(f"Processing instance {instance_id} launched with unapproved AMI: {ami_id}")
-            
-            try:
-                # Verify instance exists and get current state
-                response = ec2_client.describe_instances(InstanceIds=[instance_id])
-                
-                if not response['Reservations']:
-                    print(f"Instance {instance_id} not found in describe_instances response")
-                    continue
-                    
-                current_state = response['Reservations'][0]['Instances'][0]['State']['Name']
-                print(f"Instance {instance_id} current state: {current_state}")
-
-                if current_state == 'running':
-                    print(f"Stopping instance {instance_id}...")
-                    ec2_client.stop_instances(InstanceIds=[instance_id])
-                    
-                    # Wait for instance to be stopped
-                    print(f"Waiting for instance {instance_id} to stop...")
-                    if wait_for_instance_state(instance_id, 'stopped', max_wait_time=300):
-                        print(f"Instance {instance_id} stopped successfully. Now terminating...")
-                        ec2_client.terminate_instances(InstanceIds=[instance_id])
-                        remediated_instances.append(f"Stopped and terminated instance {instance_id} (AMI: {ami_id})")
-                        print(f"Successfully terminated instance {instance_id} after stopping.")
-                    else:
-                        print(f"Instance {instance_id} did not stop within timeout. Forcing termination...")
-                        ec2_client.terminate_instances(InstanceIds=[instance_id])
-                        remediated_instances.append(f"Force terminated instance {instance_id} (AMI: {ami_id}) - stop timeout")
-                        
-                elif current_state == 'pending':
-                    print(f"Instance {instance_id} is still starting up. Terminating directly...")
-                    ec2_client.terminate_instances(InstanceIds=[instance_id])
-                    remediated_instances.append(f"Terminated instance {instance_id} (AMI: {ami_id}) - was in pending state")
-                    print(f"Successfully terminated instance {instance_id}.")
-                    
-                elif current_state == 'stopped':
-                    print(f"Instance {instance_id} is already stopped. Terminating...")
-                    ec2_client.terminate_instances(InstanceIds=[instance_id])
-                    remediated_instances.append(f"Terminated already stopped instance {instance_id} (AMI: {ami_id})")
-                    print(f"Successfully terminated instance {instance_id}.")
-                    
-                elif current_state in ['terminated', 'terminating']:
-                    print(f"Instance {instance_id} is already terminated/terminating. No action needed.")
-                    remediated_instances.append(f"Instance {instance_id} already terminated/terminating (AMI: {ami_id})")
-                    
-                else:
-                    print(f"Instance {instance_id} is in unexpected state '{current_state}'. Attempting termination...")
-                    ec2_client.terminate_instances(InstanceIds=[instance_id])
-                    remediated_instances.append(f"Terminated instance {instance_id} from state '{current_state}' (AMI: {ami_id})")
-
-            except ClientError as e:
-                error_msg = f"Error processing instance {instance_id}: {e}"
-                print(error_msg)
-                remediated_instances.append(error_msg)
-                # Don't raise here, continue with other instances
-            except Exception as e:
-                error_msg = f"Unexpected error processing instance {instance_id}: {e}"
-                print(error_msg)
-                remediated_instances.append(error_msg)
-
-        return {"status": "success", "ami_id": ami_id, "remediated_instances": remediated_instances}
+        unapproved = {}
+        for instance_id, instance_ami in instance_amis.items():
+            if not instance_ami:
+                log.warning("No AMI ID found for instance %s", instance_id)
+            elif not allowlist.is_approved(instance_ami):
+                unapproved[instance_id] = instance_ami
+
+        if unapproved and not allowlist.rules_resolved:
+            # The AMIs approved through rules are unknown, so any of these may be approved: don't terminate on a guess.
+            # Not a final outcome: lambda_handler fails the invocation so Lambda retries the event.
+            log.error("Approved AMI rules have never resolved; not remediating %d instance(s)", len(unapproved),
+                      ami_ids=sorted(set(unapproved.values())), instance_ids=sorted(unapproved))
+            return {"status": "deferred", "message": "Approved AMI rules could not be resolved", "ami_id": ami_id,
+                    "unverified_ami_ids": sorted(set(unapproved.values()))}
+
+        if not unapproved:
+            log.decision("none", "AMI %s is approved. No action needed.", ami_id, ami_id=ami_id,
+                         ami_ids=sorted(set(filter(None, instance_amis.values()))))
+            return {"status": "approved", "ami_id": ami_id}
+
+        outcomes = remediate_instances(unapproved, remediation_deadline(context), event.get('id'))
+        remediated_instances = [outcome['message'] for outcome in outcomes.values()]
+        # 'partial' is not a final outcome: lambda_handler fails the invocation so Lambda retries the event.
+        # Instances describe_instances doesn't show yet (it is eventually consistent) are retried as well.
+        status = "partial" if any(not is_final_outcome(outcome) for outcome in outcomes.values()) else "success"
+        return {"status": status, "ami_id": ami_id, "unapproved_ami_ids": sorted(set(unapproved.values())),
+                "remediated_instances": remediated_instances, "outcomes": outcomes}
     
     except KeyError as e:
         error_msg = f"Missing required key in event structure: {e}"
-        print(error_msg)
+        log.error(error_msg)
         return {"status": "failed", "error": error_msg}
     except Exception as e:
         error_msg = f"An error occurred during unapproved AMI remediation: {e}"
-        print(error_msg)
+        log.error(error_msg)
         return {"status": "failed", "error": error_msg}
 
-def lambda_handler(event, context):
+def is_final_outcome(outcome):
+    """Whether an instance's outcome needs no further work: it didn't fail and the instance was found."""
+    return 'error' not in outcome and outcome.get('action') != 'not_found'
+
+def remediate_instances(instance_amis, deadline, event_id=None):
     """
-    Main Lambda handler that routes events to appropriate remediation functions
+    Stops and terminates the given instances ({instance_id: ami_id}) in batches.
+    Instances that don't stop before the short inline deadline are left as pending work and
+    terminated by handle_instance_state_change when EC2 reports them stopped.
+    Returns {instance_id: {"previous_state", "action", "message"[, "error"]}}.
     """
+    outcomes = {}
+    if not instance_amis:
+        return outcomes
+    instance_ids = list(instance_amis)
+    ami_ids = sorted(set(instance_amis.values()))
+
+    def record(instance_id, action, message, error=None):
+        outcome = {"previous_state": states.get(instance_id), "action": action, "message": message}
+        if error:
+            outcome["error"] = error
+        outcomes[instance_id] = outcome
+
+    log.debug("Processing %d instance(s) launched with unapproved AMIs", len(instance_ids), ami_ids=ami_ids, instance_ids=instance_ids)
     try:
-        print(f"Lambda received event: {json.dumps(event, indent=2)}")
-        
-        # Determine the event type and route to appropriate function
-        detail = event.get('detail', {})
-        event_name = detail.get('eventName', '')
-        
-        if event_name == 'AuthorizeSecurityGroupIngress':
-            return revoke_ssh_0_0_0_0_sg_rule(event)
-        elif event_name == 'RunInstances':
-            return stop_and_terminate_unapproved_ami_instance(event)
+        # Verify instances exist and get their current states
+        states = describe_instance_states(instance_ids)
+    except ClientError as e:
+        log.error("Error describing instances: %s", e, ami_ids=ami_ids, instance_ids=instance_ids)
+        states = {}
+        for instance_id in instance_ids:
+            record(instance_id, "error", f"Error processing instance {instance_id}: {e}", str(e))
+        return outcomes
+
+    to_stop, to_terminate = [], []
+    for instance_id in instance_ids:
+        current_state = states.get(instance_id)
+        if current_state is None:
+            record(instance_id, "not_found", f"Instance {instance_id} not found in describe_instances response")
+        elif current_state in ['terminated', 'terminating']:
+            record(instance_id, "none", f"Instance {instance_id} already terminated/terminating (AMI: {instance_amis[instance_id]})")
+        elif current_state == 'running':
+            to_stop.append(instance_id)
         else:
-            print(f"Unhandled event type: {event_name}")
-            return {"status": "ignored", "message": f"Event type {event_name} not handled"}
-            
+            # pending, stopped, stopping or anything unexpected: terminate directly
+            to_terminate.append(instance_id)
+
+    # Record the pending terminations first: an instance can reach 'stopped' at any point after the stop call
+    unrecorded = set(record_pending_terminations(to_stop, instance_amis, event_id)) if to_stop else set()
+
+    # Stop all running instances at once, then wait for the whole set together
+    stopping, stop_errors = batch_instance_action('stop_instances', to_stop)
+    for instance_id, error in stop_errors.items():
+        record(instance_id, "error", f"Error processing instance {instance_id}: {error}", error)
+    clear_pending_terminations([instance_id for instance_id in stop_errors if instance_id not in unrecorded])
+
+    stopped, gone, timed_out = [], [], []
+    if stopping:
+        log.debug("Waiting for instances to stop", instance_ids=stopping)
+        stopped, gone, timed_out = wait_for_instances_state(stopping, 'stopped', deadline)
+    for instance_id in gone:
+        record(instance_id, "none", f"Instance {instance_id} already terminated/terminating (AMI: {instance_amis[instance_id]})")
+
+    # Don't hold the Lambda open for slow stops: their records hand them to the state-change event.
+    # Instances without a record are force terminated instead.
+    deferred = [instance_id for instance_id in timed_out if instance_id not in unrecorded]
+    timed_out = [instance_id for instance_id in timed_out if instance_id in unrecorded]
+    for instance_id in deferred:
+        record(instance_id, "stop_requested", f"Stop requested for instance {instance_id} (AMI: {instance_amis[instance_id]}) - termination pending its 'stopped' event")
+
+    terminated, terminate_errors = batch_instance_action('terminate_instances', to_terminate + stopped + timed_out)
+    for instance_id, error in terminate_errors.items():
+        record(instance_id, "error", f"Error processing instance {instance_id}: {error}", error)
+
+    # Done inline, so the state-change event has nothing left to do
+    stopping_ids = set(stopping)
+    clear_pending_terminations([instance_id for instance_id in gone + terminated
+                                if instance_id in stopping_ids and instance_id not in unrecorded])
+
+    for instance_id in terminated:
+        previous_state = states.get(instance_id)
+        if instance_id in stopped:
+            record(instance_id, "stopped_and_terminated", f"Stopped and terminated instance {instance_id} (AMI: {instance_amis[instance_id]})")
+        elif instance_id in timed_out:
+            record(instance_id, "force_terminated", f"Force terminated instance {instance_id} (AMI: {instance_amis[instance_id]}) - stop timeout")
+        elif previous_state == 'pending':
+            record(instance_id, "terminated", f"Terminated instance {instance_id} (AMI: {instance_amis[instance_id]}) - was in pending state")
+        elif previous_state == 'stopped':
+            record(instance_id, "terminated", f"Terminated already stopped instance {instance_id} (AMI: {instance_amis[instance_id]})")
+        else:
+            record(instance_id, "terminated", f"Terminated instance {instance_id} from state '{previous_state}' (AMI: {instance_amis[instance_id]})")
+
+    # Keep the outcomes in the order the instances appeared in the event
+    outcomes = {instance_id: outcomes[instance_id] for instance_id in instance_ids if instance_id in outcomes}
+    log.decision("remediate_instances", "Remediated %d instance(s) launched with unapproved AMIs", len(outcomes),
+                 ami_ids=ami_ids, actions={instance_id: outcome["action"] for instance_id, outcome in outcomes.items()},
+                 errors={instance_id: outcome["error"] for instance_id, outcome in outcomes.items() if "error" in outcome} or None)
+    return outcomes
+
+def handle_instance_state_change(event):
+    """
+    Finishes a pending termination when EC2 reports the instance stopped.
+    Raises RemediationIncomplete if the termination fails, so the event is retried.
+    Triggered by EventBridge 'EC2 Instance State-change Notification' events.
+    """
+    detail = event.get('detail', {})
+    instance_id = detail.get('instance-id')
+    state = detail.get('state')
+    if not instance_id:
+        return {"status": "ignored", "message": "No instance ID in state-change event"}
+
+    store = get_state_store()
+    key = pending_termination_key(instance_id)
+    try:
+        pending = store.get(key)
+    except (ClientError, BotoCoreError) as e:
+        log.error("Error reading pending termination for %s: %s", instance_id, e, instance_id=instance_id)
+        raise RemediationIncomplete(f"Error reading pending termination for {instance_id}: {e}") from e
+    if pending is None:
+        return {"status": "ignored", "message": f"No pending remediation for instance {instance_id}"}
+
+    if state in ['terminated', 'shutting-down']:
+        store.delete(key)
+        return {"status": "success", "message": f"Instance {instance_id} already terminated/terminating"}
+    if state != 'stopped':
+        return {"status": "ignored", "message": f"Instance {instance_id} is {state}; waiting for 'stopped'"}
+
+    terminated, errors = batch_instance_action('terminate_instances', [instance_id])
+    if errors:
+        # No second 'stopped' event will come for this instance: keep the pending item and fail the
+        # invocation, so Lambda retries this event and the retry finds the record again
+        log.error("Error terminating instance %s: %s", instance_id, errors[instance_id], instance_id=instance_id)
+        raise RemediationIncomplete(f"Error terminating instance {instance_id}: {errors[instance_id]}")
+    store.delete(key)
+    message = f"Stopped and terminated instance {instance_id} (AMI: {pending.get('ami_id')})"
+    log.decision("terminate", message, instance_id=instance_id, ami_id=pending.get('ami_id'))
+    return {"status": "success", "remediated_instances": [message]}
+
+def event_identity(event):
+    """
+    Returns (event_id, resource_ids) used to recognise a repeated delivery of the same event:
+    the CloudTrail eventID (or the EventBridge event ID) and the security group or instances it targets.
+    """
+    detail = event.get('detail') or {}
+    if event.get('detail-type') == 'EC2 Instance State-change Notification':
+        return event.get('id'), [detail.get('instance-id') or '']
+    request_parameters = detail.get('requestParameters') or {}
+    response_elements = detail.get('responseElements') or {}
+    resource_ids = [request_parameters.get('securityGroupId') or request_parameters.get('groupId') or '']
+    instances_set = response_elements.get('instancesSet') or {}
+    if isinstance(instances_set, dict):
+        resource_ids += [item.get('instanceId', '') for item in instances_set.get('items') or [] if isinstance(item, dict)]
+    return detail.get('eventID') or event.get('id'), resource_ids
+
+def route_event(event, context):
+    """Routes an event to the appropriate remediation function."""
+    if event.get('detail-type') == 'EC2 Instance State-change Notification':
+        return handle_instance_state_change(event)
+
+    detail = event.get('detail', {})
+    event_name = detail.get('eventName', '')
+
+    if event_name == 'AuthorizeSecurityGroupIngress':
+        return revoke_world_open_sg_rules(event)
+    elif event_name == 'RunInstances':
+        return stop_and_terminate_unapproved_ami_instance(event, context)
+    else:
+        log.decision("ignore", "Unhandled event type: %s", event_name)
+        return {"status": "ignored", "message": f"Event type {event_name} not handled"}
+
+def lambda_handler(event, context):
+    """
+    Main Lambda handler that routes events to appropriate remediation functions.
+    Repeated deliveries of an event that was already handled return the recorded outcome without any API calls.
+    Raises RemediationIncomplete when the event must be handled again, so the invocation fails and is retried.
+    """
+    try:
+        log.start_invocation(event, context)
+        log.debug_dump("Lambda received event", event)
+
+        event_id, resource_ids = event_identity(event)
+        key = idempotency_key(event_id, resource_ids) if event_id else None
+        if key:
+            previous = get_idempotency_cache().get(key)
+            if previous is not None:
+                log.decision("duplicate", "Event already handled; returning the recorded outcome", status=previous.get('status'))
+                return dict(previous, duplicate=True)
+
+        result = route_event(event, context)
+        if key:
+            get_idempotency_cache().put(key, result)
+        if isinstance(result, dict) and result.get('status') in RETRY_STATUSES:
+            # Failing the invocation is what makes Lambda retry it; the result itself is only logged
+            log.error("Event not fully remediated; failing the invocation so it is retried", status=result['status'],
+                      errors={instance_id: outcome.get('error') or outcome['action']
+                              for instance_id, outcome in (result.get('outcomes') or {}).items()
+                              if not is_final_outcome(outcome)} or None)
+            raise RemediationIncomplete(f"Event not fully remediated (status '{result['status']}')")
+        return result
+
+    except RemediationIncomplete:
+        raise
     except Exception as e:
-        print(f"Error in lambda_handler: {e}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        log.error("Error in lambda_handler: %s", e)
+        return {"status": "error", "message": str(e)}
@@ -0,0 +1,182 @@
+# terraform/modules/auto-remediation/lambda_function_code/sg_rules.py
+
+# Table-driven matcher for security group ingress rules.
+# CloudTrail ipPermissions are normalized once into flat IngressRule records, then every record is
+# checked against every compiled policy in a single pass. Matching rules are grouped back into
+# IpPermissions so a whole event can be revoked with one API call.
+#
+# Policies come from the SG_POLICIES environment variable, a JSON list such as:
+#   [{"name": "ssh-open-to-world", "ports": [22], "protocols": ["tcp"]},
+#    {"name": "rdp-open-to-world", "ports": [3389]},
+#    {"name": "db-ports-open", "ports": ["5432", "3306-3307"], "cidrs": ["0.0.0.0/0"]}]
+# "protocols" defaults to ["tcp"] and "cidrs" to the IPv4 and IPv6 world ranges.
+# Rules with protocol -1 (all traffic) match every policy whose CIDRs they open.
+
+import json
+import os
+import re
+from collections import namedtuple
+
+import log
+
+WORLD_CIDRS = ('0.0.0.0/0', '::/0')
+ALL_PORTS = (0, 65535)
+
+# CloudTrail and the API accept protocol numbers as well as names
+PROTOCOL_NAMES = {'6': 'tcp', '17': 'udp', '1': 'icmp', '58': 'icmpv6', 'all': '-1'}
+
+PORT_RANGE_RE = re.compile(r'(\d+)(?:-(\d+))?')
+
+DEFAULT_POLICIES = [{"name": "ssh-open-to-world", "ports": [22], "protocols": ["tcp"]}]
+
+Policy = namedtuple('Policy', ['name', 'protocols', 'port_ranges', 'cidrs'])
+IngressRule = namedtuple('IngressRule', ['protocol', 'from_port', 'to_port', 'cidr', 'ipv6', 'description'])
+
+def normalize_protocol(protocol):
+    protocol = str(protocol).lower() if protocol is not None else '-1'
+    return PROTOCOL_NAMES.get(protocol, protocol)
+
+def parse_port_range(value):
+    """Accepts 22, "22" or "1000-2000"; returns (low, high). Raises ValueError for anything else."""
+    if isinstance(value, int):
+        low = high = value
+    else:
+        match = PORT_RANGE_RE.fullmatch(str(value).strip())
+        if match is None:
+            raise ValueError(f"Invalid port range: {value!r}")
+        low, high = int(match.group(1)), int(match.group(2) or match.group(1))
+    if not 0 <= low <= high <= 65535:
+        raise ValueError(f"Invalid port range: {value!r}")
+    return low, high
+
+def compile_policies(policies):
+    compiled = []
+    for policy in policies:
+        compiled.append(Policy(
+            name=policy.get('name', 'unnamed'),
+            protocols=frozenset(normalize_protocol(p) for p in policy.get('protocols', ['tcp'])),
+            port_ranges=tuple(parse_port_range(port) for port in policy.get('ports', [])) or (ALL_PORTS,),
+            cidrs=frozenset(policy.get('cidrs', WORLD_CIDRS)),
+        ))
+    return compiled
+
+def load_policies():
+    """
+    Compiles SG_POLICIES. A malformed value must not stop the module from importing (that would take down
+    every remediation in the Lambda), so it is logged and the default policies are enforced instead.
+    """
+    raw = os.environ.get('SG_POLICIES')
+    if not raw:
+        return compile_policies(DEFAULT_POLICIES)
+    try:
+        return compile_policies(json.loads(raw))
+    except (ValueError, TypeError, AttributeError) as e:
+        log.error("Invalid SG_POLICIES, enforcing the default policies instead: %s", e, sg_policies=raw)
+        return compile_policies(DEFAULT_POLICIES)
+
+POLICIES = load_policies()
+
+def _items(value):
+    """CloudTrail wraps lists as {"items": [...]}, and a single item may not be wrapped in a list."""
+    if isinstance(value, dict):
+        value = value.get('items', [])
+    if isinstance(value, (dict, str)):
+        return [value]
+    return value or []
+
+def _port_range(protocol, from_port, to_port):
+    # All-traffic rules and rules without ports (e.g. -1 for every port) open the whole range
+    if protocol == '-1' or from_port is None or from_port == -1:
+        return ALL_PORTS
+    return int(from_port), int(to_port if to_port not in (None, -1) else from_port)
+
+def normalize_permissions(ip_permissions):
+    """
+    Flattens CloudTrail ipPermissions into IngressRule records, one per CIDR (IPv4 and IPv6).
+    Returns a list of (permission, rule) pairs so matches can be revoked with the event's exact values.
+    """
+    rules = []
+    for perm in _items(ip_permissions):
+        if not isinstance(perm, dict):
+            log.warning("Skipping unexpected permission", permission=perm)
+            continue
+        protocol = normalize_protocol(perm.get('ipProtocol'))
+        from_port, to_port = _port_range(protocol, perm.get('fromPort'), perm.get('toPort'))
+        for key, cidr_key, ipv6 in (('ipRanges', 'cidrIp', False), ('ipv6Ranges', 'cidrIpv6', True)):
+            for ip_range in _items(perm.get(key)):
+                if isinstance(ip_range, dict):
+                    cidr, description = ip_range.get(cidr_key), ip_range.get('description')
+                else:
+                    cidr, description = ip_range, None
+                if cidr:
+                    rules.append((perm, IngressRule(protocol, from_port, to_port, cidr, ipv6, description)))
+    return rules
+
+def match_policies(rule, policies=None):
+    """Returns the names of all policies the rule violates."""
+    matched = []
+    for policy in POLICIES if policies is None else policies:
+        if rule.cidr not in policy.cidrs:
+            continue
+        if rule.protocol != '-1' and rule.protocol not in policy.protocols:
+            continue
+        if any(low <= rule.to_port and rule.from_port <= high for low, high in policy.port_ranges):
+            matched.append(policy.name)
+    return matched
+
+def find_violations(ip_permissions, policies=None):
+    """Single pass over the event's rules; returns [(permission, rule, policy_names)] for every violating rule."""
+    violations = []
+    for perm, rule in normalize_permissions(ip_permissions):
+        matched = match_policies(rule, policies)
+        if matched:
+            violations.append((perm, rule, matched))
+    return violations
+
+def build_revoke_permissions(violations):
+    """Groups violating rules back into IpPermissions (one entry per protocol/port range) for a single revoke call."""
+    grouped = {}
+    for perm, rule, _ in violations:
+        key = (perm.get('ipProtocol'), perm.get('fromPort'), perm.get('toPort'))
+        permission = grouped.get(key)
+        if permission is None:
+            permission = {'IpProtocol': key[0]}
+            # Ports are omitted for all-traffic rules, exactly as in the original request
+            if key[1] is not None:
+                permission['FromPort'] = key[1]
+            if key[2] is not None:
+                permission['ToPort'] = key[2]
+            grouped[key] = permission
+        if rule.ipv6:
+            ip_range = {'CidrIpv6': rule.cidr}
+            permission.setdefault('Ipv6Ranges', []).append(ip_range)
+        else:
+            ip_range = {'CidrIp': rule.cidr}
+            permission.setdefault('IpRanges', []).append(ip_range)
+        if rule.description:
+            ip_range['Description'] = rule.description
+    return list(grouped.values())
+
+def matching_rule_ids(rule_set, policies=None):
+    """IDs of rules in the event's securityGroupRuleSet that violate a policy, for revoking by rule ID."""
+    rule_ids = []
+    for item in _items(rule_set):
+        if not isinstance(item, dict) or item.get('isEgress') or not item.get('securityGroupRuleId'):
+            continue
+        protocol = normalize_protocol(item.get('ipProtocol'))
+        from_port, to_port = _port_range(protocol, item.get('fromPort'), item.get('toPort'))
+        cidr = item.get('cidrIpv4') or item.get('cidrIpv6')
+        rule = IngressRule(protocol, from_port, to_port, cidr, bool(item.get('cidrIpv6')), None)
+        if cidr and match_policies(rule, policies):
+            rule_ids.append(item['securityGroupRuleId'])
+    return rule_ids
+
+def describe_rule(rule):
+    if (rule.from_port, rule.to_port) == ALL_PORTS:
+        ports = "all ports"
+    elif rule.from_port == rule.to_port:
+        ports = f"port {rule.from_port}"
+    else:
+        ports = f"ports {rule.from_port}-{rule.to_port}"
+    protocol = "all protocols" if rule.protocol == '-1' else rule.protocol
+    return f"{protocol} {ports} from {rule.cidr}"
@@ -0,0 +1,102 @@
+# terraform/modules/auto-remediation/lambda_function_code/state_store.py
+
+import json
+import os
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+import log
+from aws_clients import get_client
+
+class LocalStateStore:
+    """
+    In-memory key/value store with per-item TTL, used when no DynamoDB table is configured
+    (local runs and offline tests). Set STATE_STORE_PATH to persist items to a JSON file
+    so separate local invocations can see each other's pending work.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._items = {} # key -> (expires_at, value)
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._items = {key: tuple(item) for key, item in json.load(f).items()}
+
+    def _save(self):
+        if self.path:
+            with open(self.path, "w") as f:
+                json.dump(self._items, f)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.time():
+                del self._items[key]
+                self._save()
+                return None
+            return value
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (time.time() + ttl, value)
+            self._save()
+
+    def delete(self, key):
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                self._save()
+
+class DynamoDBStateStore:
+    """
+    Shared store backed by a DynamoDB table with a string partition key 'pk'.
+    Values are stored as JSON in 'data'; 'expires_at' is the table's TTL attribute.
+    DynamoDB deletes expired items lazily, so reads also check expires_at.
+    """
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self.client = client or get_client('dynamodb')
+
+    def get(self, key):
+        response = self.client.get_item(TableName=self.table_name, Key={'pk': {'S': key}}, ConsistentRead=True)
+        item = response.get('Item')
+        if not item or float(item['expires_at']['N']) <= time.time():
+            return None
+        return json.loads(item['data']['S'])
+
+    def put(self, key, value, ttl):
+        self.client.put_item(TableName=self.table_name, Item={
+            'pk': {'S': key},
+            'data': {'S': json.dumps(value)},
+            'expires_at': {'N': str(int(time.time() + ttl))},
+        })
+
+    def delete(self, key):
+        try:
+            self.client.delete_item(TableName=self.table_name, Key={'pk': {'S': key}})
+        except ClientError as e:
+            log.warning("Error deleting state item %s: %s", key, e)
+
+_store = None
+
+def get_state_store():
+    """Returns the DynamoDB store if REMEDIATION_STATE_TABLE is set, otherwise the local stand-in."""
+    global _store
+    if _store is None:
+        table_name = os.environ.get('REMEDIATION_STATE_TABLE')
+        if table_name:
+            _store = DynamoDBStateStore(table_name)
+        else:
+            _store = LocalStateStore(os.environ.get('STATE_STORE_PATH'))
+    return _store
+
+def set_state_store(store):
+    """Replaces the store, e.g. with a LocalStateStore in tests and benchmarks."""
+    global _store
+    _store = store
@@ -60,10 +60,27 @@ resource "aws_iam_policy" "remediation_policy" {
           "ec2:DescribeInstances",
           "ec2:StopInstances",
           "ec2:TerminateInstances",
-          "ec2:DescribeInstanceStatus"
+          "ec2:DescribeInstanceStatus",
+          "ec2:DescribeImages" # Resolves approved_ami_rules to AMI IDs
         ]
         Resource = "*" # Restrict to specific instances/regions if known
       },
+      # Permissions for the remediation state table (pending terminations)
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = aws_dynamodb_table.remediation_state.arn
+      },
+      # Permissions for the on-failure destination (events still failing after Lambda's retries)
+      {
+        Effect   = "Allow"
+        Action   = "sqs:SendMessage"
+        Resource = aws_sqs_queue.remediation_failures.arn
+      },
       # Permissions for S3 remediation (if implemented)
       # {
       #   Effect = "Allow"
@@ -104,10 +121,17 @@ resource "aws_lambda_function" "auto_remediation" {
   timeout       = 60
   memory_size   = 128
 
-  # Environment variable for APPROVED_AMI_ID
+  # Environment variables for the remediation settings
   environment {
     variables = {
-      APPROVED_AMI_ID = data.aws_ami.ecs_optimized_ami_id.id # Get the AMI ID from the ECS module
+      APPROVED_AMI_ID         = data.aws_ami.ecs_optimized_ami_id.id # Get the AMI ID from the ECS module
+      APPROVED_AMI_IDS        = join(",", var.approved_ami_ids)
+      APPROVED_AMI_RULES      = jsonencode(var.approved_ami_rules)
+      APPROVED_AMI_CACHE_TTL  = var.approved_ami_cache_ttl
+      REMEDIATION_STATE_TABLE = aws_dynamodb_table.remediation_state.name
+      SG_POLICIES             = jsonencode(var.sg_policies)
+      LOG_LEVEL               = var.log_level
+      LOG_DEBUG_SAMPLE_RATE   = var.log_debug_sample_rate
     }
   }
 
@@ -117,6 +141,63 @@ resource "aws_lambda_function" "auto_remediation" {
   }
 }
 
+# Asynchronous invocation settings: an invocation that fails (e.g. a termination that didn't go through)
+# is retried by Lambda, and events that still fail after the retries are sent to the queue below
+resource "aws_lambda_function_event_invoke_config" "auto_remediation" {
+  function_name                = aws_lambda_function.auto_remediation.function_name
+  maximum_retry_attempts       = 2
+  maximum_event_age_in_seconds = 3600 # Matches how long pending terminations are kept
+
+  destination_config {
+    on_failure {
+      destination = aws_sqs_queue.remediation_failures.arn
+    }
+  }
+}
+
+# Events the Lambda could not remediate, kept for investigation and replay
+resource "aws_sqs_queue" "remediation_failures" {
+  name                      = "${var.name}-remediation-failures"
+  message_retention_seconds = 1209600 # 14 days, the maximum
+  sqs_managed_sse_enabled   = true
+
+  tags = {
+    Name    = "${var.name}-remediation-failures"
+    Service = "AutoRemediation"
+  }
+}
+
+# DynamoDB table for remediation state shared across invocations
+# (e.g. instances whose stop was requested and that are terminated on their 'stopped' event)
+resource "aws_dynamodb_table" "remediation_state" {
+  name         = "${var.name}-remediation-state"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name    = "${var.name}-remediation-state"
+    Service = "AutoRemediation"
+  }
+}
+
 # Data source to get the current approved ECS Optimized AMI ID
 # This ensures consistency with the AMIs used in the ECS modules
 data "aws_ssm_parameter" "ecs_ami" {
@@ -171,6 +252,26 @@ resource "aws_cloudwatch_event_rule" "unapproved_ami_remediation_rule" {
   }
 }
 
+# CloudWatch Event Rule for EC2 instances reaching 'stopped'
+# Completes the termination of unapproved-AMI instances without the Lambda polling for the stop
+resource "aws_cloudwatch_event_rule" "instance_stopped_rule" {
+  name        = "${var.name}-instance-stopped-rule"
+  description = "Triggers when an EC2 instance reaches the stopped state to finish pending remediations"
+
+  event_pattern = jsonencode({
+    "source" : ["aws.ec2"],
+    "detail-type" : ["EC2 Instance State-change Notification"],
+    "detail" : {
+      "state" : ["stopped"]
+    }
+  })
+
+  tags = {
+    Name    = "${var.name}-instance-stopped-rule"
+    Service = "AutoRemediation"
+  }
+}
+
 # CloudWatch Event Targets (link rules to Lambda function)
 resource "aws_cloudwatch_event_target" "ssh_remediation_target" {
   rule = aws_cloudwatch_event_rule.ssh_remediation_rule.name
@@ -182,6 +283,11 @@ resource "aws_cloudwatch_event_target" "unapproved_ami_remediation_target" {
   arn  = aws_lambda_function.auto_remediation.arn
 }
 
+resource "aws_cloudwatch_event_target" "instance_stopped_target" {
+  rule = aws_cloudwatch_event_rule.instance_stopped_rule.name
+  arn  = aws_lambda_function.auto_remediation.arn
+}
+
 # Lambda Permission to allow CloudWatch Events to invoke it
 resource "aws_lambda_permission" "allow_cloudwatch_ssh" {
   statement_id  = "AllowExecutionFromCloudWatchSSH"
@@ -198,3 +304,11 @@ resource "aws_lambda_permission" "allow_cloudwatch_ami" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.unapproved_ami_remediation_rule.arn
 }
+
+resource "aws_lambda_permission" "allow_cloudwatch_instance_stopped" {
+  statement_id  = "AllowExecutionFromCloudWatchInstanceStopped"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.auto_remediation.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.instance_stopped_rule.arn
+}
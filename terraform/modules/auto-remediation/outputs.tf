@@ -9,3 +9,13 @@ output "remediation_lambda_arn" {
   description = "The ARN of the auto-remediation Lambda function."
   value       = aws_lambda_function.auto_remediation.arn
 }
+
+output "remediation_state_table_name" {
+  description = "The name of the DynamoDB table holding remediation state (e.g. pending terminations)."
+  value       = aws_dynamodb_table.remediation_state.name
+}
+
+output "remediation_failures_queue_url" {
+  description = "The URL of the SQS queue receiving events the Lambda could not remediate after its retries."
+  value       = aws_sqs_queue.remediation_failures.url
+}
@@ -0,0 +1,52 @@
+# terraform/modules/auto-remediation/tests/fake_ec2.py
+
+# In-process stand-in for the EC2 client calls the remediation Lambda makes, installed with
+# aws_clients.set_client('ec2', ...). Unknown instances are missing from describe_instances, as
+# right after a launch; stopped instances stay 'stopping' until a test changes their state.
+# Security group rules are (group, protocol, from port, to port, CIDR) tuples; revoking one that
+# doesn't exist fails the whole call with InvalidPermission.NotFound.
+
+from botocore.exceptions import ClientError
+
+class FakePaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, Filters):
+        ids = [instance_id for f in Filters for instance_id in f["Values"]]
+        instances = [{"InstanceId": i, "State": {"Name": self.client.states[i]}} for i in ids if i in self.client.states]
+        yield {"Reservations": [{"Instances": instances}]}
+
+class FakeEC2:
+    """Instances stay 'stopping' after a stop until the test says otherwise; terminate can be made to fail."""
+
+    def __init__(self, states=None, sg_rules=()):
+        self.states = dict(states or {})
+        self.sg_rules = set(sg_rules)
+        self.calls = []
+        self.terminate_error = None
+
+    def get_paginator(self, name):
+        return FakePaginator(self)
+
+    def stop_instances(self, InstanceIds):
+        self.calls.append(("StopInstances", list(InstanceIds)))
+        for instance_id in InstanceIds:
+            self.states[instance_id] = "stopping"
+
+    def terminate_instances(self, InstanceIds):
+        self.calls.append(("TerminateInstances", list(InstanceIds)))
+        if self.terminate_error:
+            raise ClientError({"Error": {"Code": self.terminate_error, "Message": "injected"}}, "TerminateInstances")
+        for instance_id in InstanceIds:
+            self.states[instance_id] = "shutting-down"
+
+    def revoke_security_group_ingress(self, GroupId, IpPermissions):
+        self.calls.append(("RevokeSecurityGroupIngress", IpPermissions))
+        rules = {(GroupId, p["IpProtocol"], p.get("FromPort"), p.get("ToPort"), r.get("CidrIp") or r.get("CidrIpv6"))
+                 for p in IpPermissions for r in p.get("IpRanges", []) + p.get("Ipv6Ranges", [])}
+        if not rules <= self.sg_rules:
+            raise ClientError({"Error": {"Code": "InvalidPermission.NotFound", "Message": "rule not found"}},
+                              "RevokeSecurityGroupIngress")
+        self.sg_rules -= rules
+        return {"Return": True}
@@ -0,0 +1,81 @@
+# terraform/modules/auto-remediation/tests/test_pending_termination.py
+
+# Pending terminations end to end, offline: an instance that doesn't stop inline is recorded in the
+# local state store, and its 'stopped' state-change event terminates it. A termination that fails
+# must fail the invocation (so Lambda retries it) and keep the record for the retry.
+#
+# Run from the repo root (needs botocore):
+#   python -m unittest discover -s terraform/modules/auto-remediation/tests
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_function_code"))
+os.environ.pop("REMEDIATION_STATE_TABLE", None)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import aws_clients
+import idempotency
+import main
+import state_store
+from fake_ec2 import FakeEC2
+
+def stopped_event(instance_id, event_id="state-change-1"):
+    return {"id": event_id, "detail-type": "EC2 Instance State-change Notification",
+            "detail": {"instance-id": instance_id, "state": "stopped"}}
+
+class PendingTerminationTest(unittest.TestCase):
+    def setUp(self):
+        self.store = state_store.LocalStateStore()
+        state_store.set_state_store(self.store)
+        idempotency.set_idempotency_cache(idempotency.IdempotencyCache(self.store))
+        self.ec2 = FakeEC2({"i-1": "running"})
+        aws_clients.set_client("ec2", self.ec2)
+
+    def tearDown(self):
+        aws_clients.reset_clients()
+
+    def stop_without_waiting(self):
+        # A deadline in the past: the stop is requested and the instance is left to its 'stopped' event
+        outcomes = main.remediate_instances({"i-1": "ami-unapproved"}, time.monotonic(), "run-1")
+        self.assertEqual(outcomes["i-1"]["action"], "stop_requested")
+        self.assertEqual(self.ec2.calls, [("StopInstances", ["i-1"])])
+        self.assertEqual(self.store.get(main.pending_termination_key("i-1"))["ami_id"], "ami-unapproved")
+        self.ec2.states["i-1"] = "stopped"
+
+    def test_stopped_event_terminates_recorded_instance(self):
+        self.stop_without_waiting()
+
+        result = main.lambda_handler(stopped_event("i-1"), None)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.ec2.calls[-1], ("TerminateInstances", ["i-1"]))
+        self.assertIsNone(self.store.get(main.pending_termination_key("i-1")))
+
+    def test_failed_terminate_fails_invocation_and_keeps_record(self):
+        self.stop_without_waiting()
+        self.ec2.terminate_error = "RequestLimitExceeded"
+
+        with self.assertRaises(main.RemediationIncomplete):
+            main.lambda_handler(stopped_event("i-1"), None)
+        self.assertIsNotNone(self.store.get(main.pending_termination_key("i-1")))
+        self.assertEqual(self.ec2.states["i-1"], "stopped")
+
+        # Lambda's retry delivers the same event again
+        self.ec2.terminate_error = None
+        result = main.lambda_handler(stopped_event("i-1"), None)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.ec2.states["i-1"], "shutting-down")
+        self.assertIsNone(self.store.get(main.pending_termination_key("i-1")))
+
+    def test_unrecorded_instance_is_ignored(self):
+        result = main.lambda_handler(stopped_event("i-other"), None)
+
+        self.assertEqual(result["status"], "ignored")
+        self.assertEqual(self.ec2.calls, [])
+
+if __name__ == "__main__":
+    unittest.main()
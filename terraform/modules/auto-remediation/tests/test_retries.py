@@ -0,0 +1,76 @@
+# terraform/modules/auto-remediation/tests/test_retries.py
+
+# Events that aren't fully remediated must fail the invocation, so Lambda retries them, and must not
+# be recorded as handled. Covers a RunInstances event that arrives before describe_instances can see
+# the instance, and one whose termination fails.
+#
+# Run from the repo root (needs botocore):
+#   python -m unittest discover -s terraform/modules/auto-remediation/tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_function_code"))
+os.environ.pop("REMEDIATION_STATE_TABLE", None)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import ami_allowlist
+import aws_clients
+import idempotency
+import main
+import state_store
+from fake_ec2 import FakeEC2
+
+def run_instances_event(instance_id, ami_id="ami-unapproved"):
+    return {"id": "run-1", "detail-type": "AWS API Call via CloudTrail",
+            "detail": {"eventID": "run-1", "eventName": "RunInstances",
+                       "requestParameters": {"instancesSet": {"items": [{"imageId": ami_id}]}},
+                       "responseElements": {"instancesSet": {"items": [{"instanceId": instance_id, "imageId": ami_id}]}}}}
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        store = state_store.LocalStateStore()
+        state_store.set_state_store(store)
+        idempotency.set_idempotency_cache(idempotency.IdempotencyCache(store))
+        ami_allowlist.set_ami_allowlist(ami_allowlist.AmiAllowList(["ami-approved"]))
+        self.ec2 = FakeEC2({})
+        aws_clients.set_client("ec2", self.ec2)
+
+    def tearDown(self):
+        aws_clients.reset_clients()
+        ami_allowlist.set_ami_allowlist(None)
+
+    def test_instance_not_visible_yet_is_retried(self):
+        with self.assertRaises(main.RemediationIncomplete):
+            main.lambda_handler(run_instances_event("i-1"), None)
+        self.assertEqual(self.ec2.calls, [])
+
+        # By the time Lambda retries, describe_instances reports the instance
+        self.ec2.states["i-1"] = "pending"
+        result = main.lambda_handler(run_instances_event("i-1"), None)
+
+        self.assertEqual(result["status"], "success")
+        self.assertIsNone(result.get("duplicate"))
+        self.assertEqual(self.ec2.calls, [("TerminateInstances", ["i-1"])])
+        # Now final: a redelivery returns the recorded outcome
+        self.assertTrue(main.lambda_handler(run_instances_event("i-1"), None)["duplicate"])
+
+    def test_failed_termination_is_retried(self):
+        self.ec2.states["i-1"] = "pending"
+        self.ec2.terminate_error = "UnauthorizedOperation"
+        with self.assertRaises(main.RemediationIncomplete):
+            main.lambda_handler(run_instances_event("i-1"), None)
+
+        self.ec2.terminate_error = None
+        result = main.lambda_handler(run_instances_event("i-1"), None)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.ec2.states["i-1"], "shutting-down")
+
+    def test_approved_ami_is_final(self):
+        self.assertEqual(main.lambda_handler(run_instances_event("i-1", "ami-approved"), None)["status"], "approved")
+        self.assertTrue(main.lambda_handler(run_instances_event("i-1", "ami-approved"), None)["duplicate"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# terraform/modules/auto-remediation/tests/test_sg_rules.py
+
+# Security group remediation when one rule of a batch is already gone, and SG_POLICIES parsing.
+#
+# Run from the repo root (needs botocore):
+#   python -m unittest discover -s terraform/modules/auto-remediation/tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_function_code"))
+os.environ.pop("REMEDIATION_STATE_TABLE", None)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import aws_clients
+import main
+import sg_rules
+from fake_ec2 import FakeEC2
+
+def authorize_event(*ports):
+    items = [{"ipProtocol": "tcp", "fromPort": port, "toPort": port, "ipRanges": {"items": [{"cidrIp": "0.0.0.0/0"}]}}
+             for port in ports]
+    return {"detail": {"eventName": "AuthorizeSecurityGroupIngress",
+                       "requestParameters": {"groupId": "sg-1", "ipPermissions": {"items": items}}}}
+
+class RevokeTest(unittest.TestCase):
+    def setUp(self):
+        self.policies = sg_rules.POLICIES
+        sg_rules.POLICIES = sg_rules.compile_policies([{"name": "open", "ports": [22, 3389]}])
+
+    def tearDown(self):
+        sg_rules.POLICIES = self.policies
+        aws_clients.reset_clients()
+
+    def test_rule_already_gone_does_not_keep_the_others(self):
+        # The 3389 rule was removed by someone else before the Lambda ran
+        ec2 = FakeEC2(sg_rules={("sg-1", "tcp", 22, 22, "0.0.0.0/0")})
+        aws_clients.set_client("ec2", ec2)
+
+        result = main.revoke_world_open_sg_rules(authorize_event(22, 3389))
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["revoked_rules"], ["Revoked tcp port 22 from 0.0.0.0/0 on sg-1 (open)"])
+        self.assertEqual(ec2.sg_rules, set())
+
+class LoadPoliciesTest(unittest.TestCase):
+    def test_malformed_policies_fall_back_to_defaults(self):
+        for raw in ('[{"name": "bad", "ports": ["22-"]}]', '[{"ports": ["70000"]}]', '{"ports": [22]}', 'not json'):
+            os.environ["SG_POLICIES"] = raw
+            try:
+                self.assertEqual(sg_rules.load_policies(), sg_rules.compile_policies(sg_rules.DEFAULT_POLICIES), raw)
+            finally:
+                del os.environ["SG_POLICIES"]
+
+    def test_port_ranges(self):
+        self.assertEqual(sg_rules.parse_port_range("3306-3307"), (3306, 3307))
+        self.assertEqual(sg_rules.parse_port_range(22), (22, 22))
+        with self.assertRaises(ValueError):
+            sg_rules.parse_port_range("2000-1000")
+
+if __name__ == "__main__":
+    unittest.main()
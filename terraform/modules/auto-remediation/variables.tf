@@ -20,3 +20,57 @@ variable "security_group_ids_to_monitor" {
   type        = list(string)
   default     = []
 }
+
+variable "sg_policies" {
+  description = "Security group ingress policies enforced by the Lambda. Each policy lists sensitive ports (numbers or \"low-high\" ranges), optional protocols (default [\"tcp\"]) and optional CIDRs (default 0.0.0.0/0 and ::/0)."
+  type        = any
+  default     = [
+    { name = "ssh-open-to-world", ports = [22], protocols = ["tcp"] }
+  ]
+
+  validation {
+    # The Lambda falls back to the default policy when a port can't be parsed, so reject bad ports at plan time
+    condition = alltrue([
+      for policy in var.sg_policies : alltrue([
+        for port in try(policy.ports, []) : can(regex("^[0-9]{1,5}(-[0-9]{1,5})?$", tostring(port)))
+      ])
+    ])
+    error_message = "Every sg_policies port must be a number or a \"low-high\" range, e.g. 22 or \"3306-3307\"."
+  }
+}
+
+variable "log_level" {
+  description = "Log level of the Lambda: DEBUG, INFO, WARNING or ERROR."
+  type        = string
+  default     = "INFO"
+}
+
+variable "log_debug_sample_rate" {
+  description = "Share of invocations (0-1) that log the full event even when log_level is above DEBUG."
+  type        = number
+  default     = 0.01
+}
+
+variable "approved_ami_ids" {
+  description = "Additional approved AMI IDs. The ECS-optimized AMI used by the cluster is always approved."
+  type        = list(string)
+  default     = []
+}
+
+variable "approved_ami_rules" {
+  description = "Rules resolved to approved AMIs with ec2:DescribeImages, e.g. [{ owners = [\"123456789012\"], name = \"golden-*\" }]. Each rule must set owners (account IDs or aliases) and may set a name pattern and regions."
+  type        = any
+  default     = []
+
+  validation {
+    # Without owners, describe_images matches public AMIs from any account
+    condition     = alltrue([for rule in var.approved_ami_rules : length(try(rule.owners, [])) > 0])
+    error_message = "Every approved_ami_rules entry must set a non-empty owners list."
+  }
+}
+
+variable "approved_ami_cache_ttl" {
+  description = "Seconds the Lambda caches the AMIs resolved from approved_ami_rules before looking them up again."
+  type        = number
+  default     = 300
+}
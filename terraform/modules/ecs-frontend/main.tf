@@ -321,6 +321,10 @@ resource "aws_ecs_task_definition" "frontend_app" {
         {
           name  = "PORT" # Ensure Flask app listens on this port
           value = tostring((var.container_port))
+        },
+        {
+          name  = "BACKEND_URL" # Internal ALB that /api/* is proxied to
+          value = var.backend_url
         }
       ]
       logConfiguration = {
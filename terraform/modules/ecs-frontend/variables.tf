@@ -44,3 +44,13 @@ variable "ecs_log_group_name" {
   description = "The name of the CloudWatch Log Group for frontend ECS."
   type        = string
 }
+
+variable "backend_url" {
+  description = "Base URL of the internal backend ALB that the frontend's /api routes forward to."
+  type        = string
+
+  validation {
+    condition     = can(regex("^https?://[^/]+", var.backend_url))
+    error_message = "backend_url must be an http(s) URL, e.g. http://<internal ALB DNS name>."
+  }
+}
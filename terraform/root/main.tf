@@ -99,6 +99,8 @@ module "ecs_frontend" {
   min_capacity      = var.frontend_min_capacity
   # Pass CloudWatch Log Group Name
   ecs_log_group_name = module.cloudwatch_logs.frontend_log_group_name
+  # Internal backend ALB that the frontend's /api routes call
+  backend_url = "http://${module.ecs_backend.internal_alb_dns_name}"
 }
 
 # 6. ECS Backend (Application Tier)